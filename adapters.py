@@ -0,0 +1,124 @@
+import itertools
+
+import interfaces
+
+# Adapters and multiple dispatch by interfaces of arguments.
+# Lookup results are cached per concrete types, cache is dropped
+# on new registrations and on creation of new implementation classes.
+
+def dispatch_keys(tp):
+    # keys, which can be used for objects of type, most specific first:
+    # declared interfaces, their base interfaces, classes of type MRO
+    all_interfaces = getattr(tp, '__all_interfaces__', ())
+    provided = getattr(tp, '__provided_interfaces__', frozenset())
+
+    res = list(all_interfaces)
+    seen = set(res)
+    for iface in all_interfaces:
+        for base in iface.__mro__[1:]:
+            if base in provided and base not in seen:
+                seen.add(base)
+                res.append(base)
+
+    res.extend(tp.__mro__)
+    return res
+
+class LookupCache(object):
+    def __init__(self):
+        self.data = {}
+        self.version = None
+
+    def get(self, key):
+        # raises KeyError
+        if self.version != interfaces.registry_version:
+            self.clear()
+        return self.data[key]
+
+    def set(self, key, val):
+        self.data[key] = val
+
+    def clear(self):
+        self.data.clear()
+        self.version = interfaces.registry_version
+
+class Dispatcher(object):
+    # function, implementation of which is selected by types of
+    # positional arguments. Implementations are registered for
+    # interfaces or classes of arguments, for several matching
+    # implementations the one with most specific first argument
+    # wins, then second, etc.
+    def __init__(self, name):
+        self.name = name
+        self.funcs = {}
+        self.cache = LookupCache()
+
+    def register(self, *keys):
+        def closure(func):
+            self.funcs[keys] = func
+            self.cache.clear()
+            return func
+        return closure
+
+    def lookup(self, *types):
+        try:
+            return self.cache.get(types)
+        except KeyError:
+            pass
+
+        func = None
+        for keys in itertools.product(*[dispatch_keys(tp) for tp in types]):
+            if keys in self.funcs:
+                func = self.funcs[keys]
+                break
+
+        self.cache.set(types, func)
+        return func
+
+    def __call__(self, *dt, **mp):
+        func = self.lookup(*[type(arg) for arg in dt])
+        if func is None:
+            raise TypeError("No {0} implementation for {1}".format(
+                    self.name, ", ".join(type(arg).__name__ for arg in dt)))
+        return func(*dt, **mp)
+
+class AdapterRegistry(object):
+    # factories, which make objects, providing target interface,
+    # from objects, providing source interface or class
+    def __init__(self):
+        self.factories = {}
+        self.cache = LookupCache()
+
+    def register(self, source, target, factory=None):
+        # can be used as decorator, if factory is not passed
+        if factory is None:
+            return lambda factory: self.register(source, target, factory)
+
+        self.factories[(source, target)] = factory
+        self.cache.clear()
+        return factory
+
+    def lookup(self, tp, target):
+        key = (tp, target)
+        try:
+            return self.cache.get(key)
+        except KeyError:
+            pass
+
+        factory = None
+        for source in dispatch_keys(tp):
+            if (source, target) in self.factories:
+                factory = self.factories[(source, target)]
+                break
+
+        self.cache.set(key, factory)
+        return factory
+
+    def adapt(self, obj, target):
+        if interfaces.provides(obj, target):
+            return obj
+
+        factory = self.lookup(type(obj), target)
+        if factory is None:
+            raise TypeError("Can't adapt {0} to {1}".format(
+                                    type(obj).__name__, target.__name__))
+        return factory(obj)
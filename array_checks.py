@@ -0,0 +1,93 @@
+import random
+
+# Checks of arrays, passed to and returned from interface methods.
+# Only metadata is used - shape, element type, strides and flags, so
+# check cost doesn't depend on array size. Numpy arrays are recognized
+# by 'shape', 'dtype' and 'flags' attributes, so numpy import is not
+# required, other objects are accessed through memoryview.
+
+sampler = random.Random()
+
+def array_info(val):
+    # (array-like object, shape, element type, c contiguous, readonly)
+    if hasattr(val, 'shape') and hasattr(val, 'dtype') and \
+            hasattr(val, 'flags'):
+        return (val, tuple(val.shape), str(val.dtype),
+                bool(val.flags['C_CONTIGUOUS']),
+                not val.flags['WRITEABLE'])
+
+    if not isinstance(val, memoryview):
+        try:
+            val = memoryview(val)
+        except TypeError:
+            return None
+
+    shape = tuple(val.shape or ())
+    return (val, shape, val.format,
+            is_c_contiguous(shape, val.strides or (), val.itemsize),
+            val.readonly)
+
+def is_c_contiguous(shape, strides, itemsize):
+    expected = itemsize
+    for dim, stride in reversed(zip(shape, strides)):
+        if dim > 1 and stride != expected:
+            return False
+        expected *= dim
+    return True
+
+def get_item(arr, pos):
+    # pos - position in flat array
+    if hasattr(arr, 'flat'):
+        return arr.flat[pos]
+    return arr[pos]
+
+class ArraySpec(object):
+    # shape - tuple, None for any size of dimension
+    # dtype - str(arr.dtype) for numpy arrays, struct format
+    #         for buffers
+    # contiguous, readonly - required flags, None - any
+    # samples - count of random elements, passed to sample_check(item)
+    #           on every call, only 1-d buffers can be sampled
+    def __init__(self, shape=None, dtype=None, contiguous=None,
+                       readonly=None, samples=0, sample_check=None):
+        self.shape = None if shape is None else tuple(shape)
+        self.dtype = dtype
+        self.contiguous = contiguous
+        self.readonly = readonly
+        self.samples = samples if sample_check is not None else 0
+        self.sample_check = sample_check
+
+    def __call__(self, name, val):
+        info = array_info(val)
+        if info is None:
+            raise AssertionError("{0} should be array, not {1}".format(
+                                                    name, type(val)))
+
+        arr, shape, dtype, contiguous, readonly = info
+
+        if self.shape is not None:
+            if len(shape) != len(self.shape) or \
+                    any(expected is not None and expected != dim
+                            for expected, dim in zip(self.shape, shape)):
+                raise AssertionError("{0} should have shape {1}, not {2}".
+                                        format(name, self.shape, shape))
+
+        if self.dtype is not None and dtype != self.dtype:
+            raise AssertionError("{0} should have items of {1}, not {2}".
+                                        format(name, self.dtype, dtype))
+
+        if self.contiguous is not None and contiguous != self.contiguous:
+            raise AssertionError("{0} should {1}be contiguous".format(
+                                    name, "" if self.contiguous else "not "))
+
+        if self.readonly is not None and readonly != self.readonly:
+            raise AssertionError("{0} should {1}be readonly".format(
+                                    name, "" if self.readonly else "not "))
+
+        if self.samples and (hasattr(arr, 'flat') or len(shape) == 1):
+            size = 1
+            for dim in shape:
+                size *= dim
+
+            for _ in range(min(self.samples, size)):
+                self.sample_check(get_item(arr, sampler.randrange(size)))
@@ -0,0 +1,99 @@
+import sys
+import Queue
+import logging
+import threading
+
+import per_thread
+
+logger = logging.getLogger('interfaces')
+
+def log_failure(name, exc_info):
+    logger.error("Postcondition of {0} failed".format(name),
+                 exc_info=exc_info)
+
+class AsyncPostChecker(object):
+    # pool of threads, which run postconditions of guarded methods
+    # out of caller thread. Backpressure policies, when queue is full:
+    #    drop - drop new checks
+    #    block - wait for free place in queue
+    #    sample - when queue is half full submit only one
+    #             of sample_every checks, drop when full
+    # sink(method name, exc_info) is called for every failed check
+    DROP = 'drop'
+    BLOCK = 'block'
+    SAMPLE = 'sample'
+
+    def __init__(self, workers=1, queue_size=1024, policy=DROP,
+                       sample_every=10, sink=log_failure):
+        if policy not in (self.DROP, self.BLOCK, self.SAMPLE):
+            raise ValueError("Unknown policy {0!r}".format(policy))
+
+        self.policy = policy
+        self.sample_every = sample_every
+        self.sink = sink
+        self.queue = Queue.Queue(queue_size)
+
+        self.counters = per_thread.counters('submitted', 'dropped', 'failed',
+                                            'sampled')
+
+        self.threads = []
+        for _ in range(workers):
+            th = threading.Thread(target=self.worker)
+            th.daemon = True
+            th.start()
+            self.threads.append(th)
+
+    def submit(self, func, *dt, **mp):
+        counters = self.counters.get()
+        counters.submitted += 1
+
+        if self.policy == self.BLOCK:
+            self.queue.put((func, dt, mp))
+            return
+
+        if self.policy == self.SAMPLE and \
+                self.queue.qsize() * 2 >= self.queue.maxsize:
+            counters.sampled += 1
+            if counters.sampled % self.sample_every != 0:
+                counters.dropped += 1
+                return
+
+        try:
+            self.queue.put_nowait((func, dt, mp))
+        except Queue.Full:
+            counters.dropped += 1
+
+    def worker(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+
+                func, dt, mp = item
+                try:
+                    func(*dt, **mp)
+                except Exception:
+                    self.counters.get().failed += 1
+                    self.sink(func.__name__, sys.exc_info())
+            finally:
+                self.queue.task_done()
+
+    def join(self):
+        # wait till all submitted checks are done
+        self.queue.join()
+
+    def stop(self):
+        for _ in self.threads:
+            self.queue.put(None)
+
+        for th in self.threads:
+            th.join()
+
+        self.threads = []
+
+    def snapshot(self):
+        return {'submitted' : per_thread.total(self.counters, 'submitted'),
+                'dropped' : per_thread.total(self.counters, 'dropped'),
+                'failed' : per_thread.total(self.counters, 'failed'),
+                'queued' : self.queue.qsize()}
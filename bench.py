@@ -0,0 +1,228 @@
+import sys
+import json
+import time
+import timeit
+import argparse
+import threading
+
+import check_func_iface
+from interfaces import Interface, ImplementsBase, check_signature_acceptable, \
+                       check_types
+
+def make_func(name, args, body="pass"):
+    src = "def {0}({1}):\n    {2}\n".format(name, ", ".join(args), body)
+    namespace = {}
+    exec(src, namespace)
+    return namespace[name]
+
+def make_interface(idx, methods_count):
+    cdict = {}
+    for midx in range(methods_count):
+        name = "func_{0}_{1}".format(idx, midx)
+        cdict[name] = make_func(name, ['self', 'x', 'y'])
+    return type(Interface)("Iface{0}".format(idx), (Interface,), cdict)
+
+def make_implementation(interfaces, depth, base=ImplementsBase):
+    cdict = {}
+    for iface in interfaces:
+        for name in iface.__interface_methods__:
+            cdict[name] = make_func(name, ['self', 'x', 'y'], "return x")
+
+    cls = base
+    for level in range(depth):
+        level_dict = {}
+        if level == 0:
+            level_dict.update(cdict)
+            level_dict['__implements__'] = list(interfaces)
+        cls = type(ImplementsBase)("Impl{0}".format(level), (cls,), level_dict)
+    return cls
+
+def best_of(func, number, repeat):
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+def bench_class_creation(opts):
+    # ImplementsMeta.__new__ time for growing interfaces/methods/depth
+    res = []
+    for ifaces_count in (1, 4, 16):
+        for methods_count in (1, 8, 32):
+            interfaces = [make_interface(idx, methods_count)
+                                for idx in range(ifaces_count)]
+            for depth in (1, 4, 16):
+                tm = best_of(lambda: make_implementation(interfaces, depth),
+                             opts.number_slow, opts.repeat)
+                res.append({'bench' : 'class_creation',
+                            'interfaces' : ifaces_count,
+                            'methods' : methods_count,
+                            'depth' : depth,
+                            'time' : tm})
+    return res
+
+def bench_signature_check(opts):
+    # check_signature_acceptable calls per second
+    pairs = [
+        ('positional',
+            make_func('iface', ['a', 'b', 'c']),
+            make_func('impl', ['a', 'b', 'c'])),
+        ('defaults',
+            make_func('iface', ['a', 'b', 'c=1']),
+            make_func('impl', ['a', 'b', 'c=1', 'd=2'])),
+        ('varargs',
+            make_func('iface', ['a', '*dt', '**mp']),
+            make_func('impl', ['a', '*dt', '**mp'])),
+    ]
+
+    def uncached(iface_func, impl_func):
+        # the first check of pair, caches are cleared before it
+        check_func_iface.acceptable_cache.clear()
+        check_func_iface.code_signatures.clear()
+        check_signature_acceptable(iface_func, impl_func)
+
+    res = []
+    for name, iface_func, impl_func in pairs:
+        for cached, func in ((True, check_signature_acceptable),
+                             (False, uncached)):
+            tm = best_of(lambda: func(iface_func, impl_func),
+                         opts.number, opts.repeat)
+            res.append({'bench' : 'signature_check',
+                        'case' : name,
+                        'cached' : cached,
+                        'time' : tm,
+                        'calls_per_second' : 1.0 / tm})
+    return res
+
+class PlainIface(Interface):
+    def func(self, x, y):
+        assert isinstance(x, int)
+
+class GenIface(Interface):
+    def func(self, x, y):
+        assert isinstance(x, int)
+        res = yield
+        assert res is not None
+
+class TypedIface(Interface):
+    @check_types(x=int, returns=int)
+    def func(self, x, y):
+        pass
+
+class Unguarded(object):
+    def func(self, x, y):
+        return x
+
+class PlainGuarded(ImplementsBase):
+    __implements__ = [PlainIface]
+    def func(self, x, y):
+        return x
+
+class GenGuarded(ImplementsBase):
+    __implements__ = [GenIface]
+    def func(self, x, y):
+        return x
+
+class TypedGuarded(ImplementsBase):
+    __implements__ = [TypedIface]
+    def func(self, x, y):
+        return x
+
+def bench_call_overhead(opts):
+    # guarded method call time versus plain method call
+    res = []
+    base_tm = None
+    for name, cls in (('unguarded', Unguarded),
+                      ('plain_check', PlainGuarded),
+                      ('generator_check', GenGuarded),
+                      ('typed_check', TypedGuarded)):
+        obj = cls()
+        tm = best_of(lambda: obj.func(1, 2), opts.number, opts.repeat)
+        if base_tm is None:
+            base_tm = tm
+        res.append({'bench' : 'call_overhead',
+                    'case' : name,
+                    'time' : tm,
+                    'overhead' : tm - base_tm})
+    return res
+
+def run_threads(func, threads_count, calls):
+    # time for threads_count threads, each calls func calls times,
+    # threads start together
+    start = threading.Event()
+
+    def worker():
+        start.wait()
+        for _ in range(calls):
+            func(1, 2)
+
+    threads = [threading.Thread(target=worker) for _ in range(threads_count)]
+    for th in threads:
+        th.start()
+
+    t0 = time.time()
+    start.set()
+    for th in threads:
+        th.join()
+    return time.time() - t0
+
+def bench_thread_scaling(opts):
+    # throughput of guarded method, called from growing number of threads
+    gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+    calls = max(1, opts.number // 10)
+
+    res = []
+    for name, cls in (('unguarded', Unguarded),
+                      ('plain_check', PlainGuarded),
+                      ('generator_check', GenGuarded)):
+        obj = cls()
+        for threads_count in (1, 2, 4, 8, 16, 32):
+            tm = min(run_threads(obj.func, threads_count, calls)
+                        for _ in range(opts.repeat))
+            res.append({'bench' : 'thread_scaling',
+                        'case' : name,
+                        'threads' : threads_count,
+                        'gil' : gil,
+                        'time' : tm,
+                        'calls_per_second' : threads_count * calls / tm})
+    return res
+
+all_benchmarks = {
+    'class_creation' : bench_class_creation,
+    'signature_check' : bench_signature_check,
+    'call_overhead' : bench_call_overhead,
+    'thread_scaling' : bench_thread_scaling,
+}
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+                description="Benchmarks for interfaces machinery")
+    parser.add_argument('-o', '--output', default=None,
+                        help="file to store results to, stdout by default")
+    parser.add_argument('-n', '--number', type=int, default=100000,
+                        help="calls per measurement for fast operations")
+    parser.add_argument('-s', '--number-slow', type=int, default=20,
+                        help="calls per measurement for class creation")
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help="measurements count, best is taken")
+    parser.add_argument('benchmarks', nargs='*',
+                        default=sorted(all_benchmarks),
+                        help="benchmarks to run")
+    return parser.parse_args(argv)
+
+def main(argv):
+    opts = parse_args(argv[1:])
+
+    # one json record per line - easy to diff and to load
+    results = []
+    for name in opts.benchmarks:
+        for record in all_benchmarks[name](opts):
+            record['python'] = sys.version.split()[0]
+            record['timestamp'] = time.time()
+            results.append(json.dumps(record, sort_keys=True))
+
+    if opts.output is None:
+        print("\n".join(results))
+    else:
+        with open(opts.output, 'w') as fd:
+            fd.write("\n".join(results) + "\n")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,187 @@
+import sys
+import time
+import struct
+import threading
+import argparse
+import importlib
+import cPickle
+
+import per_thread
+
+# Recording of guarded methods calls to append-only binary log and
+# replay of them on other implementations of the same interface.
+# Log format - magic, then records: 4 bytes little endian length and
+# pickled (method key, args, kwargs, result, duration, timestamp).
+# Method key is 'module.Interface.method'.
+
+MAGIC = b'ITRACE1\n'
+header = struct.Struct('<I')
+
+class SampleCountdown(threading.local):
+    # calls, left till next recorded one, for every thread
+    left = 1
+
+class CallRecorder(object):
+    # every - record every N-th call of each thread
+    # max_bytes - log size limit, calls are not recorded after it is
+    #             reached, it can be exceeded by a few records, written
+    #             from several threads at once
+    def __init__(self, fname, every=1, max_bytes=None):
+        self.fname = fname
+        self.every = every
+        self.max_bytes = max_bytes
+        self.sample = SampleCountdown()
+        self.counters = per_thread.counters('recorded', 'skipped', 'dropped',
+                                            'unpicklable')
+
+        self.fd = open(fname, 'ab')
+        self.size = self.fd.tell()
+        if self.size == 0:
+            self.fd.write(MAGIC)
+            self.size = len(MAGIC)
+
+    def bind(self, key):
+        # function, which records calls of one method
+        def record(args, kwargs, result, duration):
+            self.record(key, args, kwargs, result, duration)
+        return record
+
+    def record(self, key, args, kwargs, result, duration):
+        sample = self.sample
+        sample.left -= 1
+        if sample.left > 0:
+            self.counters.get().skipped += 1
+            return
+        sample.left = self.every
+
+        if self.max_bytes is not None and self.size >= self.max_bytes:
+            self.counters.get().dropped += 1
+            return
+
+        try:
+            data = cPickle.dumps((key, args, kwargs or {}, result,
+                                  duration, time.time()), 2)
+        except Exception:
+            self.counters.get().unpicklable += 1
+            return
+
+        # one write per record, so records from different threads
+        # are not mixed
+        self.fd.write(header.pack(len(data)) + data)
+        self.size += header.size + len(data)
+        self.counters.get().recorded += 1
+
+    def flush(self):
+        self.fd.flush()
+
+    def close(self):
+        self.fd.close()
+
+    def snapshot(self):
+        res = dict((name, per_thread.total(self.counters, name))
+                        for name in ('recorded', 'skipped', 'dropped',
+                                     'unpicklable'))
+        res['size'] = self.size
+        return res
+
+def read_trace(fname):
+    # yields (method key, args, kwargs, result, duration, timestamp),
+    # incomplete last record is ignored
+    with open(fname, 'rb') as fd:
+        if fd.read(len(MAGIC)) != MAGIC:
+            raise ValueError("{0} is not a calls trace".format(fname))
+
+        while True:
+            head = fd.read(header.size)
+            if len(head) < header.size:
+                break
+
+            size, = header.unpack(head)
+            data = fd.read(size)
+            if len(data) < size:
+                break
+
+            yield cPickle.loads(data)
+
+def method_key(iface, name):
+    return "{0}.{1}.{2}".format(iface.__module__, iface.__name__, name)
+
+def replay(fname, obj, checked=False, timer=time.time):
+    # call methods of obj with recorded arguments, in the same order,
+    # as they was recorded. Only calls of interfaces, which obj
+    # provides, are replayed. Returns {method key : report}
+    keys = {}
+    for iface in getattr(type(obj), '__provided_interfaces__', ()):
+        for name in iface.__interface_methods__:
+            keys[method_key(iface, name)] = name
+
+    res = {}
+    for key, args, kwargs, result, duration, _ in read_trace(fname):
+        name = keys.get(key)
+        if name is None:
+            continue
+
+        report = res.get(key)
+        if report is None:
+            report = res[key] = {'calls' : 0,
+                                 'mismatches' : 0,
+                                 'errors' : 0,
+                                 'recorded_time' : 0.0,
+                                 'replay_time' : 0.0}
+
+        method = getattr(obj, name)
+        if not checked:
+            func = getattr(method, 'im_func', method)
+            real_func = getattr(func, '__real_func__', None)
+            if real_func is not None:
+                method = real_func.__get__(obj, type(obj))
+
+        report['calls'] += 1
+        report['recorded_time'] += duration
+
+        t0 = timer()
+        try:
+            replay_result = method(*args, **kwargs)
+        except Exception:
+            report['errors'] += 1
+            continue
+        finally:
+            report['replay_time'] += timer() - t0
+
+        if replay_result != result:
+            report['mismatches'] += 1
+
+    for report in res.values():
+        report['speedup'] = report['recorded_time'] / report['replay_time'] \
+                                if report['replay_time'] else None
+    return res
+
+def load_object(path):
+    # 'module:name'
+    module, _, name = path.partition(':')
+    return getattr(importlib.import_module(module), name)
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+                description="Replay recorded calls on implementation")
+    parser.add_argument('trace', help="calls trace file")
+    parser.add_argument('implementation',
+                        help="implementation class, as module:name")
+    parser.add_argument('-c', '--checked', action='store_true',
+                        help="replay calls with interface checks")
+    return parser.parse_args(argv)
+
+def main(argv):
+    opts = parse_args(argv[1:])
+    obj = load_object(opts.implementation)()
+
+    report = replay(opts.trace, obj, opts.checked)
+    for key in sorted(report):
+        print("{0}: {1}".format(key, report[key]))
+
+    failed = any(curr['mismatches'] or curr['errors']
+                    for curr in report.values())
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,67 @@
+import time
+
+import per_thread
+
+class CheckCache(object):
+    # arguments, which already passed pure precondition check.
+    # Eviction drops least recently used quarter of records, when
+    # cache is full, records older, than ttl seconds, are ignored
+    def __init__(self, size=1024, ttl=None, timer=time.time):
+        self.size = size
+        self.ttl = ttl
+        self.timer = timer
+        self.used = {}
+        self.added = {}
+        self.tick = 0
+        self.counters = per_thread.counters('hits', 'misses', 'unhashable')
+
+    def reset_counters(self):
+        per_thread.reset(self.counters)
+
+    def clear(self):
+        self.used.clear()
+        self.added.clear()
+
+    def hit(self, key):
+        # raises TypeError for unhashable key. Records can be removed
+        # by other threads, tick can lose increments - it only makes
+        # usage order approximate
+        used = self.used
+        if key in used:
+            if self.ttl is not None and \
+                    self.timer() - self.added.get(key, 0) > self.ttl:
+                used.pop(key, None)
+                self.added.pop(key, None)
+            else:
+                self.tick += 1
+                used[key] = self.tick
+                self.counters.get().hits += 1
+                return True
+
+        self.counters.get().misses += 1
+        return False
+
+    def add(self, key):
+        if len(self.used) >= self.size:
+            self.evict()
+
+        self.tick += 1
+        self.used[key] = self.tick
+        if self.ttl is not None:
+            self.added[key] = self.timer()
+
+    def evict(self):
+        by_usage = sorted(self.used.items(), key=lambda item: item[1])
+        for key, _ in by_usage[:max(1, len(by_usage) // 4)]:
+            self.used.pop(key, None)
+            self.added.pop(key, None)
+
+    def bypass(self):
+        self.counters.get().unhashable += 1
+
+    def snapshot(self):
+        return {'hits' : per_thread.total(self.counters, 'hits'),
+                'misses' : per_thread.total(self.counters, 'misses'),
+                'unhashable' : per_thread.total(self.counters, 'unhashable'),
+                'size' : len(self.used),
+                'max_size' : self.size}
@@ -1,15 +1,82 @@
+import types
 import inspect
+import collections
+
+# compact signature descriptor
+ArgSpec = collections.namedtuple('ArgSpec', 'args varargs keywords defaults')
+
+# code object => (args, varargs, keywords), the oldest entries are
+# dropped, so code objects of dead functions are not kept forever
+code_signatures = collections.OrderedDict()
+SIGNATURES_CACHE_SIZE = 4096
+
+# (iface code, iface defaults, impl code, impl defaults, iface_no_self)
+# for signature pairs, which already checked to be acceptable
+acceptable_cache = collections.OrderedDict()
+ACCEPTABLE_CACHE_SIZE = 4096
+
+def get_code_and_defaults(func):
+    if isinstance(func, types.MethodType):
+        func = func.im_func
+
+    if isinstance(func, types.FunctionType):
+        return func.__code__, func.__defaults__
+
+    return None, None
+
+def get_argspec(func):
+    code, defaults = get_code_and_defaults(func)
+
+    if code is None:
+        argspec = inspect.getargspec(func)
+        return ArgSpec(tuple(argspec.args), argspec.varargs,
+                       argspec.keywords, argspec.defaults)
+
+    try:
+        args, varargs, keywords = code_signatures[code]
+    except KeyError:
+        args, varargs, keywords = inspect.getargs(code)
+        args = tuple(args)
+        if len(code_signatures) >= SIGNATURES_CACHE_SIZE:
+            code_signatures.popitem(last=False)
+        code_signatures[code] = (args, varargs, keywords)
+
+    return ArgSpec(args, varargs, keywords, defaults)
 
 def check_signature_acceptable(iface_func, impl_func, iface_no_self=False):
     # check, that impl_func can be called with any set off arguments
     # with acceptable for iface_func
-    
-    iface_argspec = inspect.getargspec(iface_func)
-    impl_argspec = inspect.getargspec(impl_func)
-    
+    iface_code, iface_defaults = get_code_and_defaults(iface_func)
+    impl_code, impl_defaults = get_code_and_defaults(impl_func)
+
+    if iface_code is None or impl_code is None:
+        key = None
+    else:
+        key = (iface_code, iface_defaults, impl_code, impl_defaults,
+               iface_no_self)
+        try:
+            if key in acceptable_cache:
+                return
+        except TypeError:
+            # unhashable defaults
+            key = None
+
+    check_argspec_acceptable(iface_func, get_argspec(iface_func),
+                             impl_func, get_argspec(impl_func),
+                             iface_no_self)
+
+    if key is not None:
+        if len(acceptable_cache) >= ACCEPTABLE_CACHE_SIZE:
+            acceptable_cache.popitem(last=False)
+        acceptable_cache[key] = True
+
+def check_argspec_acceptable(iface_func, iface_argspec,
+                             impl_func, impl_argspec,
+                             iface_no_self=False):
     if iface_no_self:
-        if iface_argspec.args[0] != 'self':
-            iface_argspec.args.insert(0, 'self')
+        if iface_argspec.args[:1] != ('self',):
+            iface_argspec = iface_argspec._replace(
+                                    args=('self',) + iface_argspec.args)
     
     if iface_argspec.varargs is not None and impl_argspec.varargs is None:
         raise AssertionError("{0} have varargs, while {1} - not".
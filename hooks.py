@@ -0,0 +1,275 @@
+import ast
+import dis
+import types
+import inspect
+import textwrap
+
+from check_func_iface import get_argspec
+from check_cache import CheckCache
+from item_checks import ItemContract
+
+# Pre and post hooks for interface methods - plain functions, called
+# by guard wrapper before and after implementation.
+# Pre hook gets the same arguments, as interface method, post hook
+# gets method result first and then the same arguments. If first
+# hook argument is named 'self' - implementation object is passed
+# as well, for post hook self goes before result.
+# Interface method with hooks is not called, so its body should be
+# empty ('pass' or docstring), AssertionError is raised otherwise.
+
+def add_hooks(func, pre_hooks=(), post_hooks=()):
+    # hooks from upper decorators should be called first
+    if not is_empty_func(func):
+        raise AssertionError(
+            "{0} has hooks, its body should be empty".format(func))
+
+    func.__pre_hooks__ = list(pre_hooks) + getattr(func, '__pre_hooks__', [])
+    func.__post_hooks__ = list(post_hooks) + \
+                            getattr(func, '__post_hooks__', [])
+    return func
+
+def pre(hook):
+    def closure(func):
+        return add_hooks(func, pre_hooks=[hook])
+    return closure
+
+def post(hook):
+    def closure(func):
+        return add_hooks(func, post_hooks=[hook])
+    return closure
+
+def contract(pre=None, post=None):
+    def closure(func):
+        return add_hooks(func,
+                         pre_hooks=[] if pre is None else [pre],
+                         post_hooks=[] if post is None else [post])
+    return closure
+
+def check_arg_names(func, names):
+    argspec = get_argspec(func)
+    for name in names:
+        if name not in argspec.args:
+            raise AssertionError(
+                "{0} have no argument {1}".format(func, name))
+
+def check_types(returns=None, **arg_types):
+    # declare types of arguments and result of interface method,
+    # types are checked by isinstance calls, generated into guard
+    # wrapper. Type can be a class or a tuple of classes
+    def closure(func):
+        check_arg_names(func, arg_types)
+        func.__arg_types__ = arg_types
+        func.__return_type__ = returns
+        return func
+    return closure
+
+def check_arrays(returns=None, **arg_specs):
+    # declare ArraySpec's for array arguments and result of
+    # interface method, only arrays metadata is checked
+    def closure(func):
+        check_arg_names(func, arg_specs)
+        func.__arg_arrays__ = arg_specs
+        func.__return_array__ = returns
+        return func
+    return closure
+
+def cache_check(size=1024, ttl=None):
+    # precondition of interface method is a pure function of arguments
+    # (self excluded), so arguments, which passed it once, are not
+    # checked again. Not used for generator checks, which can't
+    # be split on pre and post hooks
+    def closure(func):
+        func.__check_cache__ = CheckCache(size, ttl)
+        return func
+    return closure
+
+def check_items(check, every=1, max_items=None):
+    # interface method returns iterator, check(item) is called for
+    # items, when they are pulled from it. Guard wrapper returns
+    # generator instead of implementation result
+    def closure(func):
+        func.__item_contract__ = ItemContract(check, every, max_items)
+        return func
+    return closure
+
+def get_types(check_func):
+    # ({arg name : type}, return type or None)
+    return (getattr(check_func, '__arg_types__', {}),
+            getattr(check_func, '__return_type__', None))
+
+def get_arrays(check_func):
+    # ({arg name : ArraySpec}, ArraySpec for result or None)
+    return (getattr(check_func, '__arg_arrays__', {}),
+            getattr(check_func, '__return_array__', None))
+
+# attributes of check function, which are not checks by itself
+declaration_attrs = ('__arg_types__', '__arg_arrays__', '__item_contract__')
+
+def is_empty_func(func):
+    # function body is 'pass' or docstring only
+    code = func.__code__
+    co_code = code.co_code
+    return len(co_code) == 4 and \
+           ord(co_code[0]) == dis.opmap['LOAD_CONST'] and \
+           ord(co_code[3]) == dis.opmap['RETURN_VALUE'] and \
+           code.co_consts[ord(co_code[1]) + 256 * ord(co_code[2])] is None
+
+def has_hooks(func):
+    return hasattr(func, '__pre_hooks__') or hasattr(func, '__post_hooks__')
+
+def get_hooks(check_func):
+    # (pre hooks, post hooks) for interface method or None, if check
+    # function should be called as is. Generator checks are split on
+    # pre and post hooks, if possible
+    try:
+        return check_func.__dict__['__hooks__']
+    except KeyError:
+        pass
+
+    if has_hooks(check_func):
+        res = (getattr(check_func, '__pre_hooks__', []),
+               getattr(check_func, '__post_hooks__', []))
+    elif any(hasattr(check_func, attr) for attr in declaration_attrs) and \
+            is_empty_func(check_func):
+        # only declarations are checked
+        res = ([], [])
+    elif inspect.isgeneratorfunction(check_func):
+        res = split_generator(check_func)
+    else:
+        res = None
+
+    check_func.__hooks__ = res
+    return res
+
+def is_yield_stmt(node):
+    # 'yield' or 'name = yield'
+    if isinstance(node, ast.Expr):
+        value = node.value
+    elif isinstance(node, ast.Assign) and len(node.targets) == 1 and \
+            isinstance(node.targets[0], ast.Name):
+        value = node.value
+    else:
+        return False
+    return isinstance(value, ast.Yield) and value.value is None
+
+def names(nodes, ctx):
+    res = set()
+    for node in nodes:
+        for sub_node in ast.walk(node):
+            if isinstance(sub_node, ast.Name) and isinstance(sub_node.ctx, ctx):
+                res.add(sub_node.id)
+    return res
+
+def has_node(nodes, node_types):
+    for node in nodes:
+        for sub_node in ast.walk(node):
+            if isinstance(sub_node, node_types):
+                return True
+    return False
+
+def split_generator(check_func):
+    # compile generator check function like
+    #
+    #    def func(self, x):
+    #        <pre>
+    #        res = yield
+    #        <post>
+    #
+    # to pre(self, x) and post(self, res, x) functions. Returns None,
+    # if it's not possible
+    if check_func.__closure__ is not None:
+        return None
+
+    try:
+        src = textwrap.dedent(inspect.getsource(check_func))
+        module = ast.parse(src)
+    except (IOError, TypeError, SyntaxError, IndentationError):
+        return None
+
+    if len(module.body) != 1 or \
+            not isinstance(module.body[0], ast.FunctionDef):
+        return None
+
+    func_def = module.body[0]
+    yield_pos = [pos for pos, node in enumerate(func_def.body)
+                    if is_yield_stmt(node)]
+
+    if len(yield_pos) != 1:
+        return None
+
+    pos = yield_pos[0]
+    pre_body = func_def.body[:pos]
+    post_body = func_def.body[pos + 1:]
+    yield_node = func_def.body[pos]
+
+    # the only one yield, no returns in pre part, no pre locals in post
+    # part, no exec, which can bind any name
+    nested = (ast.FunctionDef, ast.Lambda, ast.ClassDef, ast.GeneratorExp)
+    if has_node(pre_body + post_body, (ast.Yield, ast.Exec) + nested) or \
+            has_node(pre_body, ast.Return):
+        return None
+
+    argspec = get_argspec(check_func)
+    arg_names = set(argspec.args)
+    if argspec.varargs:
+        arg_names.add(argspec.varargs)
+    if argspec.keywords:
+        arg_names.add(argspec.keywords)
+
+    if isinstance(yield_node, ast.Assign):
+        res_name = yield_node.targets[0].id
+    else:
+        res_name = '__res'
+
+    # locals of generator, which are not bound by assignments in post
+    # part, are bound in pre part - by assignment, import, etc. Post
+    # gets original arguments, so rebound ones can't be used there too
+    pre_locals = set(check_func.__code__.co_varnames) - arg_names - \
+                    names(post_body, ast.Store) - set([res_name])
+    pre_locals |= names(pre_body, ast.Store)
+    if pre_locals & names(post_body, ast.Load):
+        return None
+
+    # result can't be passed to post under name of argument
+    if res_name in arg_names:
+        return None
+
+    pre_def = ast.FunctionDef(name='pre',
+                              args=func_def.args,
+                              body=pre_body or [ast.Pass()],
+                              decorator_list=[])
+
+    post_args = ast.arguments(args=list(func_def.args.args),
+                              vararg=func_def.args.vararg,
+                              kwarg=func_def.args.kwarg,
+                              defaults=func_def.args.defaults)
+    res_pos = 1 if argspec.args[:1] == ('self',) else 0
+    post_args.args.insert(res_pos, ast.Name(id=res_name, ctx=ast.Param()))
+
+    post_def = ast.FunctionDef(name='post',
+                               args=post_args,
+                               body=post_body or [ast.Pass()],
+                               decorator_list=[])
+
+    new_module = ast.Module(body=[pre_def, post_def])
+    ast.increment_lineno(new_module, check_func.__code__.co_firstlineno - 1)
+    ast.fix_missing_locations(new_module)
+
+    try:
+        code = compile(new_module, check_func.__code__.co_filename, 'exec')
+    except SyntaxError:
+        return None
+
+    # functions should share globals with original check function
+    funcs = {}
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            funcs[const.co_name] = types.FunctionType(
+                                            const,
+                                            check_func.__globals__,
+                                            "{0}_{1}".format(
+                                                    check_func.__name__,
+                                                    const.co_name),
+                                            check_func.__defaults__)
+    return ([funcs['pre']] if pre_body else [],
+            [funcs['post']] if post_body else [])
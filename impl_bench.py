@@ -0,0 +1,265 @@
+import gc
+import sys
+import json
+import time
+import random
+import string
+import argparse
+import importlib
+
+from interfaces import make_wrapper, implementations_of, verify_class
+from check_func_iface import get_argspec
+from hooks import get_types
+
+# Benchmark of all implementations of interface, side by side.
+# Calls for every interface method are taken from workload, or are
+# generated from check_types declarations. Only calls, which pass
+# precondition of interface method, are used.
+
+class PreconditionPassed(Exception):
+    pass
+
+def stop_before_call(*dt, **mp):
+    raise PreconditionPassed()
+
+def precondition(check_func):
+    # function(obj, *dt, **mp) -> True, if precondition passed
+    wrapper = make_wrapper(check_func, stop_before_call)
+
+    def closure(obj, *dt, **mp):
+        try:
+            wrapper(obj, *dt, **mp)
+        except PreconditionPassed:
+            return True
+        except AssertionError:
+            return False
+        raise AssertionError("Precondition of {0} doesn't stop before call".
+                                    format(check_func.__name__))
+    return closure
+
+def random_str(rng):
+    return "".join(rng.choice(string.ascii_letters)
+                        for _ in range(rng.randint(0, 16)))
+
+# type => function(rng), which makes random value of type
+generators = {
+    int : lambda rng: rng.randint(-1000, 1000),
+    long : lambda rng: long(rng.randint(-1000, 1000)),
+    float : lambda rng: rng.uniform(-1000.0, 1000.0),
+    bool : lambda rng: rng.random() < 0.5,
+    str : random_str,
+    unicode : lambda rng: unicode(random_str(rng)),
+    type(None) : lambda rng: None,
+}
+
+def alternatives(tp):
+    # isinstance accepts class or tuple of classes
+    return tp if isinstance(tp, tuple) else (tp,)
+
+def can_generate(tp):
+    return any(curr in generators for curr in alternatives(tp))
+
+def generate_value(tp, rng):
+    for curr in alternatives(tp):
+        if curr in generators:
+            return generators[curr](rng)
+
+def generate_calls(check_func, count, rng):
+    # [(args, kwargs)], generated from arguments types, None - types
+    # are not declared for all arguments
+    arg_types, _ = get_types(check_func)
+    args = get_argspec(check_func).args
+    if args[:1] == ('self',):
+        args = args[1:]
+
+    for name in args:
+        if name not in arg_types or not can_generate(arg_types[name]):
+            return None
+
+    return [(tuple(generate_value(arg_types[name], rng) for name in args), {})
+                for _ in range(count)]
+
+def percentile(sorted_vals, pos):
+    if not sorted_vals:
+        return None
+    return sorted_vals[min(len(sorted_vals) - 1,
+                           int(len(sorted_vals) * pos))]
+
+def allocated_blocks():
+    # net count of allocated memory blocks, python 3.4+ only
+    func = getattr(sys, 'getallocatedblocks', None)
+    return None if func is None else func()
+
+def measure(method, calls, repeat):
+    # latencies of every call and net allocations per call
+    latencies = []
+    timer = time.time
+
+    gc_was_enabled = gc.isenabled()
+    gc.collect()
+    gc.disable()
+    try:
+        gc_count = gc.get_count()[0]
+        blocks = allocated_blocks()
+
+        for _ in range(repeat):
+            for args, kwargs in calls:
+                t0 = timer()
+                method(*args, **kwargs)
+                latencies.append(timer() - t0)
+
+        # tracked objects, which are still alive after calls
+        gc_objects = gc.get_count()[0] - gc_count
+        if blocks is not None:
+            blocks = allocated_blocks() - blocks
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    count = len(latencies)
+    latencies.sort()
+    total = sum(latencies)
+    return {'calls' : count,
+            'total_time' : total,
+            'calls_per_second' : count / total if total else None,
+            'mean' : total / count if count else None,
+            'p50' : percentile(latencies, 0.5),
+            'p90' : percentile(latencies, 0.9),
+            'p99' : percentile(latencies, 0.99),
+            'max' : latencies[-1] if latencies else None,
+            'gc_objects_per_call' : float(gc_objects) / count
+                                        if count else None,
+            'blocks_per_call' : float(blocks) / count
+                                        if count and blocks is not None
+                                            else None}
+
+def bound_method(obj, name, checked):
+    method = getattr(obj, name)
+    if checked:
+        return method
+
+    # implementation itself, without guard
+    func = getattr(method, 'im_func', method)
+    real_func = getattr(func, '__real_func__', None)
+    if real_func is None:
+        return method
+    return real_func.__get__(obj, type(obj))
+
+def benchmark(iface, workload=None, implementations=None, factories=None,
+              count=1000, repeat=1, checked=False, seed=0):
+    # workload - {method name : [(args, kwargs)]}, calls for methods
+    #            without types declaration
+    # implementations - classes to compare, all known implementations
+    #                   of interface by default
+    # factories - {class : function, which makes instance}
+    # checked - measure calls with interface checks
+    workload = workload or {}
+    factories = factories or {}
+
+    if implementations is None:
+        implementations = implementations_of(iface)
+        for impl_cls in implementations:
+            verify_class(impl_cls)
+
+    implementations = sorted(implementations,
+                             key=lambda cls: (cls.__module__, cls.__name__))
+
+    res = []
+    for name, check_func in sorted(iface.__interface_methods__.items()):
+        rng = random.Random(seed)
+        if name in workload:
+            calls = list(workload[name])
+        else:
+            calls = generate_calls(check_func, count, rng)
+
+        passes = precondition(check_func)
+
+        for impl_cls in implementations:
+            record = {'interface' : "{0}.{1}".format(iface.__module__,
+                                                     iface.__name__),
+                      'class' : "{0}.{1}".format(impl_cls.__module__,
+                                                 impl_cls.__name__),
+                      'method' : name}
+            res.append(record)
+
+            if calls is None:
+                record['error'] = "no workload and arguments types"
+                continue
+
+            try:
+                obj = factories.get(impl_cls, impl_cls)()
+            except Exception as exc:
+                record['error'] = "can't create instance: {0!r}".format(exc)
+                continue
+
+            valid = [(args, kwargs) for args, kwargs in calls
+                        if passes(obj, *args, **kwargs)]
+            record['rejected'] = len(calls) - len(valid)
+
+            try:
+                record.update(measure(bound_method(obj, name, checked),
+                                      valid, repeat))
+            except Exception as exc:
+                record['error'] = "call failed: {0!r}".format(exc)
+
+    return res
+
+def load_object(path):
+    # 'module:name'
+    module, _, name = path.partition(':')
+    return getattr(importlib.import_module(module), name)
+
+def load_workload(fname):
+    # {method name : [[args list, kwargs dict], ...]}
+    with open(fname) as fd:
+        data = json.load(fd)
+    return dict((name, [(tuple(args), kwargs) for args, kwargs in calls])
+                    for name, calls in data.items())
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+                description="Compare performance of interface implementations")
+    parser.add_argument('interface',
+                        help="interface to benchmark, as module:name")
+    parser.add_argument('-i', '--import', dest='imports', action='append',
+                        default=[],
+                        help="module with implementations to import")
+    parser.add_argument('-w', '--workload', default=None,
+                        help="json file with calls for methods")
+    parser.add_argument('-n', '--count', type=int, default=1000,
+                        help="generated calls per method")
+    parser.add_argument('-r', '--repeat', type=int, default=1,
+                        help="times to repeat workload")
+    parser.add_argument('-c', '--checked', action='store_true',
+                        help="measure calls with interface checks")
+    parser.add_argument('-s', '--seed', type=int, default=0,
+                        help="seed for generated calls")
+    parser.add_argument('-o', '--output', default=None,
+                        help="file to store results to, stdout by default")
+    return parser.parse_args(argv)
+
+def main(argv):
+    opts = parse_args(argv[1:])
+
+    iface = load_object(opts.interface)
+    for module in opts.imports:
+        importlib.import_module(module)
+
+    workload = None
+    if opts.workload is not None:
+        workload = load_workload(opts.workload)
+
+    records = benchmark(iface, workload, count=opts.count,
+                        repeat=opts.repeat, checked=opts.checked,
+                        seed=opts.seed)
+
+    results = [json.dumps(record, sort_keys=True) for record in records]
+    if opts.output is None:
+        print("\n".join(results))
+    else:
+        with open(opts.output, 'w') as fd:
+            fd.write("\n".join(results) + "\n")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
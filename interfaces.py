@@ -1,10 +1,23 @@
+import time
 import types
+import weakref
+import copy_reg
+import threading
 import inspect
 import functools
 
-from check_func_iface import check_signature_acceptable
+from check_func_iface import check_signature_acceptable, get_argspec
+from method_stats import MethodStats
+from async_checks import AsyncPostChecker
+from call_trace import CallRecorder, method_key
+from hooks import pre, post, contract, check_types, cache_check, check_items, \
+                  check_arrays, get_hooks, get_types, get_arrays
+from array_checks import ArraySpec
+
+import manifest
 
 RUNTIME_CHECK = True
+LAZY_CHECK = False
 
 def get_method(class_name, func):
     @functools.wraps(func)
@@ -55,141 +68,1088 @@ class InterfaceMeta(type):
             
             res.update(interface_methods)
             cdict['__interface_methods__'] = res
+
+            forget_interface(cdict.get('__module__'), name)
         
         return super(InterfaceMeta, cls).__new__(cls, name, bases, cdict)
 
 
+wrong_check_func = "Somethig wrong with check func"
+
+wrapper_tmpl = """
+def guarded({params}):
+{body}
+"""
+
+post_check_tmpl = """
+def __post_check({params}):
+{body}
+"""
+
+gen_check_pre = ["__check = __check_func({check_args})",
+                 "next(__check)"]
+
+gen_check_post = ["try:",
+                  "    __check.send(__res)",
+                  "except StopIteration:",
+                  "    pass",
+                  "else:",
+                  "    raise AssertionError(__wrong_check_func)"]
+
+plain_check_pre = ["__check_func({check_args})"]
+
+# sampling gates - return from wrapper without checks for
+# calls, which are not sampled. Every N-th call of each thread
+# is checked
+every_sample_gate = ["__sample.left -= 1",
+                     "if __sample.left > 0:",
+                     "    return __real_func({real_args})",
+                     "__sample.left = {every}"]
+
+# shared by all threads, races can only let a few more calls
+# to be checked in a second
+per_second_sample_gate = ["__now = __timer()",
+                          "if __now < __sample[0]:",
+                          "    return __real_func({real_args})",
+                          "__sample[0] = __now + {interval!r}"]
+
+class SampleCountdown(threading.local):
+    # calls, left till next checked one, for every thread
+    left = 1
+
+def cached_check_tmpl(sig):
+    # skip precondition for arguments, which already passed it, 
+    # __hit is None for unhashable arguments. Types are parts of key,
+    # as equal values of different types (1, 1.0, True) can have
+    # different check results
+    key = []
+    for arg in sig.args:
+        if arg.startswith('**'):
+            key.append("frozenset([(__k, type(__v), __v) "
+                       "for __k, __v in {0}.items()])".format(arg[2:]))
+        elif arg.startswith('*'):
+            key.append("tuple([(type(__v), __v) "
+                       "for __v in {0}])".format(arg[1:]))
+        else:
+            key.append("(type({0}), {0})".format(arg))
+
+    return ["try:",
+            "    __key = ({0},)".format(", ".join(key)) if key 
+                                    else "    __key = ()",
+            "    __hit = __cache_hit(__key)",
+            "except TypeError:",
+            "    __hit = None",
+            "    __cache_bypass()",
+            "if not __hit:"]
+
+def recorded_args_tmpl(sig):
+    # expressions for positional arguments tuple and keyword
+    # arguments dict of call, self excluded
+    positional = [arg for arg in sig.args if not arg.startswith('*')]
+    args = "({0})".format("".join(arg + ", " for arg in positional))
+    kwargs = "None"
+    for arg in sig.args:
+        if arg.startswith('**'):
+            kwargs = arg[2:]
+        elif arg.startswith('*'):
+            args += " + " + arg[1:]
+    return args, kwargs
+
+def type_check_tmpl(name, type_name):
+    return ["if not isinstance({0}, {1}):".format(name, type_name),
+            "    __type_error({0!r}, {0}, {1})".format(name, type_name)]
+
+def type_error(name, val, tp):
+    if name == '__res':
+        name = 'result'
+    raise AssertionError("{0} should be instance of {1}, not {2}".format(
+                                    name, tp, type(val)))
+
+def indent(lines, level=1):
+    return ["    " * level + line for line in lines]
+
+def report_failures(lines, handler):
+    # let adaptive state/statistic know about failed check
+    return ["try:"] + indent(lines) + \
+           ["except AssertionError:",
+            "    {0}()".format(handler),
+            "    raise"]
+
+def call_all(*funcs):
+    def closure():
+        for func in funcs:
+            func()
+    return closure
+
+def is_selfable(check_func):
+    return get_argspec(check_func).args[:1] == ('self',)
+
+class WrapperSignature(object):
+    # parameters list of wrapper, built from interface function
+    # signature, and arguments lists for calls from wrapper
+    def __init__(self, check_func):
+        argspec = get_argspec(check_func)
+        args = list(argspec.args)
+
+        self.selfable = is_selfable(check_func)
+        if self.selfable:
+            self.self_name = args.pop(0)
+        else:
+            self.self_name = 'self'
+            while self.self_name in args:
+                self.self_name = '_' + self.self_name
+
+        if argspec.varargs is not None:
+            args.append('*' + argspec.varargs)
+        if argspec.keywords is not None:
+            args.append('**' + argspec.keywords)
+
+        self.args = args
+        self.defaults = argspec.defaults
+
+    def params(self):
+        return self.call_args(True)
+
+    def call_args(self, with_self, extra=()):
+        res = [self.self_name] if with_self else []
+        return ", ".join(res + list(extra) + self.args)
+
+def make_wrapper(check_func, real_func, sampling=None, adaptive=None,
+                 stats=None, async_post=None, recorder=None):
+    # generate wrapper with the same parameters list, as interface function
+    # has, all decisions are made here, so call cost only consists from
+    # check and real function calls
+    # adaptive - AdaptiveState, to report passed and failed checks
+    # stats - MethodStats, to record calls and time
+    # async_post - AsyncPostChecker, to run postconditions in
+    #              other thread
+    # recorder - function(args, kwargs, result, duration), to record
+    #            successful calls
+    sig = WrapperSignature(check_func)
+    check_args = sig.call_args(sig.selfable)
+    real_args = sig.call_args(True)
+
+    namespace = {'__check_func' : check_func,
+                 '__real_func' : real_func,
+                 '__wrong_check_func' : wrong_check_func,
+                 '__timer' : time.time}
+
+    body = []
+    if sampling is not None:
+        kind, rate = sampling
+        if kind == 'every':
+            gate = every_sample_gate
+            namespace['__sample'] = SampleCountdown()
+        else:
+            gate = per_second_sample_gate
+            namespace['__sample'] = [0.0]
+
+        if stats is not None:
+            # count unchecked calls before return from gate
+            gate = gate[:2] + ["    __unchecked()"] + gate[2:]
+            namespace['__unchecked'] = stats.unchecked
+
+        body.extend(gate)
+
+    hooks = get_hooks(check_func)
+    if hooks is not None:
+        # plain calls of pre and post hooks
+        pre, post = [], []
+        pre_hooks, post_hooks = hooks
+
+        for pos, hook in enumerate(pre_hooks):
+            name = "__pre_hook{0}".format(pos)
+            namespace[name] = hook
+            pre.append("{0}({1})".format(name,
+                                         sig.call_args(is_selfable(hook))))
+
+        for pos, hook in enumerate(post_hooks):
+            name = "__post_hook{0}".format(pos)
+            namespace[name] = hook
+            post.append("{0}({1})".format(name,
+                                          sig.call_args(is_selfable(hook),
+                                                        ['__res'])))
+    elif inspect.isgeneratorfunction(check_func):
+        pre, post = gen_check_pre, gen_check_post
+    else:
+        pre, post = plain_check_pre, []
+
+    gen_used = pre is gen_check_pre
+
+    check_cache = getattr(check_func, '__check_cache__', None)
+    if check_cache is not None and pre and not gen_used:
+        namespace['__cache_hit'] = check_cache.hit
+        namespace['__cache_add'] = check_cache.add
+        namespace['__cache_bypass'] = check_cache.bypass
+        pre = cached_check_tmpl(sig) + indent(pre) + \
+              ["    if __hit is not None:",
+               "        __cache_add(__key)"]
+
+    # array guards check metadata only
+    arg_arrays, return_array = get_arrays(check_func)
+    array_pre = []
+    for name in sorted(arg_arrays):
+        spec_name = "__arg_array_" + name
+        namespace[spec_name] = arg_arrays[name]
+        array_pre.append("{0}({1!r}, {1})".format(spec_name, name))
+    pre = array_pre + pre
+
+    if return_array is not None:
+        namespace['__return_array'] = return_array
+        post = ["__return_array('result', __res)"] + post
+
+    # type guards go before other checks
+    arg_types, return_type = get_types(check_func)
+    if arg_types or return_type is not None:
+        namespace['__type_error'] = type_error
+        type_pre = []
+        for name in sorted(arg_types):
+            type_name = "__arg_type_" + name
+            namespace[type_name] = arg_types[name]
+            type_pre.extend(type_check_tmpl(name, type_name))
+        pre = type_pre + pre
+
+        if return_type is not None:
+            namespace['__return_type'] = return_type
+            post = type_check_tmpl('__res', '__return_type') + post
+
+    pre_failed = []
+    post_failed = []
+
+    if adaptive is not None:
+        pre_failed.append(adaptive.failed)
+        post_failed.append(adaptive.failed)
+
+    if stats is not None:
+        pre_failed.append(stats.pre_failed)
+        post_failed.append(stats.post_failed)
+
+    if pre and pre_failed:
+        pre = report_failures(pre, "__pre_failed")
+        namespace['__pre_failed'] = call_all(*pre_failed)
+
+    if post and post_failed:
+        post = report_failures(post, "__post_failed")
+        namespace['__post_failed'] = call_all(*post_failed)
+
+    src = ""
+    if async_post is not None and post:
+        # postcondition is moved to separated function, which
+        # is called from checker thread
+        src = post_check_tmpl.format(
+                    params=", ".join(["__res", "__check", sig.params()]),
+                    body="\n".join(indent(post)).format(real_args=real_args))
+        namespace['__submit'] = async_post.submit
+        post = ["__submit(__post_check, __res, {0}, {{real_args}})".format(
+                                        "__check" if gen_used else "None")]
+
+    # items are checked in consumer thread, when it pulls them
+    item_contract = getattr(check_func, '__item_contract__', None)
+    if item_contract is not None:
+        namespace['__wrap_items'] = item_contract.wrap
+        post = post + ["__res = __wrap_items(__res)"]
+
+    timed = stats is not None or recorder is not None or \
+            (adaptive is not None and adaptive.policy.max_overhead is not None)
+
+    if timed:
+        body.append("__t0 = __timer()")
+        body.extend(pre)
+        body.append("__t1 = __timer()")
+        body.append("__res = __real_func({real_args})")
+        body.append("__t2 = __timer()")
+        body.extend(post)
+        body.append("__t3 = __timer()")
+    else:
+        body.extend(pre)
+        body.append("__res = __real_func({real_args})")
+        body.extend(post)
+
+    if stats is not None:
+        namespace['__record'] = stats.record
+        body.append("__record(__t1 - __t0, __t2 - __t1, __t3 - __t2)")
+
+    if adaptive is not None:
+        namespace['__passed'] = adaptive.passed
+        if timed:
+            body.append("__passed(__t1 - __t0 + __t3 - __t2, __t2 - __t1)")
+        else:
+            body.append("__passed()")
+
+    if recorder is not None:
+        namespace['__record_call'] = recorder
+        body.append("__record_call({0}, {1}, __res, __t2 - __t1)".format(
+                                        *recorded_args_tmpl(sig)))
+
+    body.append("return __res")
+
+    body = "\n".join(indent(body))
+    body = body.format(check_args=check_args,
+                       real_args=real_args,
+                       every=sampling and sampling[1],
+                       interval=sampling and 1.0 / sampling[1])
+    src = wrapper_tmpl.format(params=sig.params(), body=body) + src
+
+    code = compile(src,
+                   "<guarded {0}>".format(real_func.__name__),
+                   "exec")
+    exec(code, namespace)
+
+    wrapper = namespace['guarded']
+    wrapper.__name__ = real_func.__name__
+    wrapper.func_defaults = sig.defaults
+    wrapper.__doc__ = real_func.__doc__
+    wrapper.__module__ = real_func.__module__
+    wrapper.__real_func__ = real_func
+    wrapper.__check_func__ = check_func
+
+    if '__post_check' in namespace:
+        namespace['__post_check'].__name__ = real_func.__name__
+    return wrapper
+
 def check_and_call(check_func, real_func):
     if RUNTIME_CHECK:
+        return make_wrapper(check_func, real_func)
+    else:
+        return real_func
+
+# runtime check switches, (interface, method name) => enabled
+# None in key means any interface/method, RUNTIME_CHECK is used
+# if no switch matches
+check_switches = {}
+
+# sampling modes, same keys as for check_switches, values
+# are ('every', N) - check one of N calls or ('per_second', N) - 
+# check not more, than N calls per second
+sample_rates = {}
+
+# instrumentation switches, same keys as for check_switches
+instrument_switches = {}
+
+# AsyncPostChecker's, same keys as for check_switches
+async_post_switches = {}
+
+# CallRecorder's, same keys as for check_switches
+recording_switches = {}
+
+# all classes, created by ImplementsMeta and successfully verified
+implementation_classes = weakref.WeakSet()
+
+# interface => WeakSet of classes, which provide it
+implementations = weakref.WeakKeyDictionary()
+
+# changed on every registration, to invalidate lookup caches
+registry_version = 0
+
+# adaptive checking policies, same keys as for check_switches
+adaptive_policies = {}
+
+def find_switch(switches, iface, fname, default):
+    # method switch is more specific, than interface one
+    for key in ((iface, fname), (None, fname)):
+        if key in switches:
+            return switches[key]
+
+    for base in iface.__mro__:
+        if (base, None) in switches:
+            return switches[(base, None)]
+
+    return switches.get((None, None), default)
+
+def is_check_enabled(iface, fname):
+    return find_switch(check_switches, iface, fname, RUNTIME_CHECK)
+
+def get_sampling(iface, fname):
+    return find_switch(sample_rates, iface, fname, None)
+
+def get_adaptive_policy(iface, fname):
+    return find_switch(adaptive_policies, iface, fname, None)
+
+def is_instrumented(iface, fname):
+    return find_switch(instrument_switches, iface, fname, False)
+
+def get_async_post(iface, fname):
+    return find_switch(async_post_switches, iface, fname, None)
+
+def get_recorder(iface, fname):
+    return find_switch(recording_switches, iface, fname, None)
+
+class AdaptivePolicy(object):
+    # start with full checks, go to sampled checks after 'promote_after'
+    # passed calls in a row or if checks takes more, than 'max_overhead'
+    # part of method time (measured over at least 'min_calls' calls).
+    # Any failed check returns method to full checks
+    def __init__(self, promote_after=1000, sampling=('every', 100),
+                       max_overhead=None, min_calls=100):
+        self.promote_after = promote_after
+        self.sampling = sampling
+        self.max_overhead = max_overhead
+        self.min_calls = min_calls
+
+class AdaptiveCounters(threading.local):
+    # passed checks of one thread, counters are valid only
+    # for the same generation of AdaptiveState
+    generation = None
+    passed_in_row = 0
+    check_time = 0.0
+    body_time = 0.0
+
+class AdaptiveState(object):
+    FULL = 'full'
+    SAMPLED = 'sampled'
+
+    def __init__(self, guard, policy):
+        self.guard = guard
+        self.policy = policy
+        self.tier = self.FULL
+        self.generation = 0
+        self.counters = AdaptiveCounters()
+
+    def reset(self):
+        # drops counters of all threads, lost increment of generation
+        # still changes it
+        self.generation += 1
+
+    def set_tier(self, tier):
+        self.tier = tier
+        self.reset()
+        self.guard.install()
+
+    def passed(self, check_time=0.0, body_time=0.0):
+        if self.tier == self.SAMPLED:
+            # nothing to promote to
+            return
+
+        counters = self.counters
+        if counters.generation != self.generation:
+            counters.generation = self.generation
+            counters.passed_in_row = 0
+            counters.check_time = 0.0
+            counters.body_time = 0.0
 
-        if inspect.getargspec(check_func).args[0] == 'self':
-            check_func.selfable = True
+        counters.passed_in_row += 1
+        counters.check_time += check_time
+        counters.body_time += body_time
+
+        if counters.passed_in_row >= self.policy.promote_after:
+            self.set_tier(self.SAMPLED)
+        elif self.policy.max_overhead is not None and \
+                counters.passed_in_row >= self.policy.min_calls and \
+                counters.check_time > \
+                        counters.body_time * self.policy.max_overhead:
+            self.set_tier(self.SAMPLED)
+
+    def failed(self):
+        if self.tier != self.FULL:
+            self.set_tier(self.FULL)
+        else:
+            self.reset()
+
+class GuardedMethod(object):
+    # interface method, guarded in implementation class
+    def __init__(self, name, iface, iface_func, real_func):
+        self.name = name
+        self.iface = iface
+        self.iface_func = iface_func
+        self.real_func = real_func
+        self.owner = None
+        self.adaptive = None
+        self.stats = None
+        self.wrappers = {}
+
+    def get_func(self):
+        if not is_check_enabled(self.iface, self.name):
+            return self.real_func
+
+        policy = get_adaptive_policy(self.iface, self.name)
+        if policy is None:
+            self.adaptive = None
+            sampling = get_sampling(self.iface, self.name)
         else:
-            check_func.selfable = False
+            if self.adaptive is None or self.adaptive.policy is not policy:
+                self.adaptive = AdaptiveState(self, policy)
 
-        def closure(self, *dt, **mp):
-            if getattr(check_func, 'selfable', False):
-                obj = check_func(self, *dt, **mp)
+            if self.adaptive.tier == AdaptiveState.SAMPLED:
+                sampling = policy.sampling
             else:
-                obj = check_func(*dt, **mp)
-            
-            if isinstance(obj, types.GeneratorType):
-                obj.next()
-            
-            res = real_func(self, *dt, **mp)
-
-            if isinstance(obj, types.GeneratorType):
-                try:
-                    obj.send(res)
-                except StopIteration:
-                    pass
-                else:
-                    raise AssertionError("Somethig wrong with check func")
-            
-            return res
+                sampling = None
+
+        instrumented = is_instrumented(self.iface, self.name)
+        if instrumented and self.stats is None:
+            self.stats = MethodStats()
+
+        async_post = get_async_post(self.iface, self.name)
+        recorder = get_recorder(self.iface, self.name)
+
+        key = (sampling, self.adaptive and self.adaptive.tier, policy,
+               instrumented, async_post, recorder)
+        if key not in self.wrappers:
+            wrapper = make_wrapper(self.iface_func,
+                                   self.real_func,
+                                   sampling,
+                                   self.adaptive,
+                                   self.stats if instrumented else None,
+                                   async_post,
+                                   recorder and recorder.bind(
+                                        method_key(self.iface, self.name)))
+            wrapper.__guarded_name__ = self.name
+            self.wrappers[key] = wrapper
+        return self.wrappers[key]
 
-        closure.__real_func__ = real_func
-        return closure
+    def install(self):
+        impl_cls = self.owner()
+        if impl_cls is not None:
+            func = self.get_func()
+            if impl_cls.__dict__.get(self.name) is not func:
+                setattr(impl_cls, self.name, func)
+
+def set_async_post(checker, iface=None, method=None):
+    # run postconditions in AsyncPostChecker threads,
+    # None - run them in caller thread
+    key = (iface, method)
+
+    if checker is not None:
+        async_post_switches[key] = checker
     else:
-        return real_func
-    
+        async_post_switches.pop(key, None)
+
+    reinstall_guards()
+
+def set_recording(recorder, iface=None, method=None):
+    # record successful calls with CallRecorder, None - stop recording
+    key = (iface, method)
+
+    if recorder is not None:
+        recording_switches[key] = recorder
+    else:
+        recording_switches.pop(key, None)
+
+    reinstall_guards()
+
+def iter_guards():
+    for impl_cls in list(implementation_classes):
+        for guard in impl_cls.__dict__['__guarded_methods__'].values():
+            yield impl_cls, guard
+
+def reinstall_guards():
+    # put wrappers or real functions into implementation classes,
+    # according to current switches
+    for impl_cls, guard in iter_guards():
+        guard.install()
+
+def set_runtime_check(enabled, iface=None, method=None):
+    # switch runtime checks on/off globally, for interface or 
+    # for method(of given interface or of any interface).
+    # Global switch drops all more specific ones
+    global RUNTIME_CHECK
+
+    if iface is None and method is None:
+        RUNTIME_CHECK = enabled
+        check_switches.clear()
+    else:
+        check_switches[(iface, method)] = enabled
+
+    reinstall_guards()
+
+def enable_checks(iface=None, method=None):
+    set_runtime_check(True, iface, method)
+
+def disable_checks(iface=None, method=None):
+    set_runtime_check(False, iface, method)
+
+def set_sampling(every=None, per_second=None, iface=None, method=None):
+    # check only one of 'every' calls or not more, than 'per_second'
+    # calls per second. Without rates - drop sampling for
+    # interface/method and use more common settings
+    key = (iface, method)
+
+    if every is not None and per_second is not None:
+        raise ValueError("Only one of every and per_second can be used")
+
+    if every is not None:
+        sample_rates[key] = ('every', int(every))
+    elif per_second is not None:
+        sample_rates[key] = ('per_second', float(per_second))
+    else:
+        sample_rates.pop(key, None)
+
+    reinstall_guards()
+
+def set_adaptive(policy=None, iface=None, method=None, **params):
+    # set AdaptivePolicy for interface/method, policy can be
+    # given ready or via AdaptivePolicy parameters.
+    # Without parameters - drop adaptive checking
+    key = (iface, method)
+
+    if policy is None and params:
+        policy = AdaptivePolicy(**params)
+
+    if policy is not None:
+        adaptive_policies[key] = policy
+    else:
+        adaptive_policies.pop(key, None)
+
+    reinstall_guards()
+
+def set_instrumentation(enabled, iface=None, method=None):
+    # record calls count, check and body time for guarded methods
+    if iface is None and method is None:
+        instrument_switches.clear()
+    instrument_switches[(iface, method)] = enabled
+    reinstall_guards()
+
+def stats_snapshot():
+    # list of statistic records for all instrumented methods
+    res = []
+    for impl_cls, guard in iter_guards():
+        if guard.stats is not None:
+            record = guard.stats.snapshot()
+            record['class'] = "{0}.{1}".format(impl_cls.__module__,
+                                               impl_cls.__name__)
+            record['interface'] = "{0}.{1}".format(guard.iface.__module__,
+                                                   guard.iface.__name__)
+            record['method'] = guard.name
+            res.append(record)
+    return res
+
+def check_cache_snapshot():
+    # counters of check caches for all guarded interface methods
+    res = {}
+    for impl_cls, guard in iter_guards():
+        check_cache = getattr(guard.iface_func, '__check_cache__', None)
+        if check_cache is not None:
+            key = "{0}.{1}.{2}".format(guard.iface.__module__,
+                                       guard.iface.__name__,
+                                       guard.name)
+            res[key] = check_cache.snapshot()
+    return res
+
+def reset_stats():
+    for impl_cls, guard in iter_guards():
+        if guard.stats is not None:
+            guard.stats.reset()
+
+# tuples of interfaces, which are known to be consistent in this
+# order - check of methods signatures is not symmetric
+consistent_sets = set()
+
+# (module, interface name) => consistent sets with such interface
+consistent_sets_index = {}
+
+def remember_consistent_set(key):
+    consistent_sets.add(key)
+    for iface in key:
+        consistent_sets_index.setdefault(
+                (iface.__module__, iface.__name__), set()).add(key)
+
+def forget_interface(module, name):
+    # interface is redefined - drop results for old one
+    for key in consistent_sets_index.pop((module, name), ()):
+        consistent_sets.discard(key)
+        for iface in key:
+            consistent_sets_index.get((iface.__module__, iface.__name__),
+                                      set()).discard(key)
+
 incpt_ifaces = """Incompatible interfaces set: {0}. They have the same called methods {1}"""
 
 class ImplementsMeta(type):
-    no_check = InterfaceMeta.no_check
 
     @classmethod
-    def check_interfaces_consistency(cls, all_interfaces):
+    def check_interfaces_consistency(cls, all_interfaces, verified=()):
+        # verified - subset of all_interfaces, which is known to be
+        # consistent in the same order, methods of two verified
+        # interfaces are not checked again
+        key = tuple(all_interfaces)
+        if key in consistent_sets:
+            return
+
+        verified = tuple(verified)
+        if verified in consistent_sets:
+            verified = frozenset(verified)
+        else:
+            verified = frozenset()
+
+        # the check is not symmetric, so it goes in order of interfaces
+        # and only pairs of verified interfaces are skipped
         fdict = {}
-        fnames_set = set()
         fname_to_iface = {}
+
         for interface in all_interfaces:
-            fnames = set(interface.__interface_methods__.keys())
-            for name in fnames.intersection(fnames_set):
-                curr_method = interface.__interface_methods__[name]
-                try:
-                    check_signature_acceptable(fdict[name], curr_method)
-                except AssertionError:
-                    err = AssertionError(
-                        "Interfaces {0} and {1} is inconsistent".format(
-                                interface, 
-                                fname_to_iface[name]))
-                    err.iface1 = interface
-                    err.iface2 = fname_to_iface[name]
-            fnames_set.update(fnames)
-            fdict.update(interface.__interface_methods__)
-            fname_to_iface.update(dict((name, interface) for name in fnames))
+            is_new = interface not in verified
+            for name, curr_method in interface.__interface_methods__.items():
+                if name in fdict and \
+                        (is_new or fname_to_iface[name] not in verified):
+                    try:
+                        check_signature_acceptable(fdict[name], curr_method)
+                    except AssertionError:
+                        err = AssertionError(
+                            "Interfaces {0} and {1} is inconsistent".format(
+                                    interface, 
+                                    fname_to_iface[name]))
+                        err.iface1 = interface
+                        err.iface2 = fname_to_iface[name]
+                        raise err
+                fdict[name] = curr_method
+                fname_to_iface[name] = interface
 
-    def __new__(cls, name, bases, cdict):
-        
-        # tempo class - recursive call
-        if name == cls.no_check:
-            return super(ImplementsMeta, cls).__new__(cls, name, bases, cdict)
+        remember_consistent_set(key)
 
-        tempo_cls = type.__new__(type, cls.no_check , bases, cdict)
-        
-        # check interface set consistency - no duplicated functions from
-        # different inheritance path's
-        if '__all_interfaces__' not in cdict:
-            all_interfaces = set()
-            for curr_cls in tempo_cls.mro():
-                all_interfaces.update(getattr(curr_cls, '__implements__', []))
-            all_interfaces = list(all_interfaces)
+    @classmethod
+    def resolve_interfaces(cls, bases, cdict):
+        # find all interfaces and interface methods table for new class
+        # incrementally - from first implementation base and delta,
+        # added by class itself and by other bases.
+        # Returns (all interfaces, methods table, names of methods,
+        # which should be guarded by this class or None - all of them,
+        # if interfaces set changed)
+        # methods table - name => ((interface, interface method), ...),
+        # first interface in list is the most recent one
+        if '__all_interfaces__' in cdict:
+            all_interfaces = list(cdict['__all_interfaces__'])
+            table = {}
+            for iface in all_interfaces:
+                for fname, func in iface.__interface_methods__.items():
+                    table[fname] = table.get(fname, ()) + ((iface, func),)
+            return all_interfaces, table, None, True
+
+        first = None
+        for base in bases:
+            if isinstance(base, ImplementsMeta):
+                first = base
+                break
+
+        if first is not None:
+            inherited = first.__all_interfaces__
+            table = first.__interface_table__
         else:
-            all_interfaces = cdict['__all_interfaces__']
-        
-        if not cdict.get('__no_interfaces_consistency_check__', False):
-            cls.check_interfaces_consistency(all_interfaces)
-
-        # get all interfaces method and track interface for each method
-        # iterate over interfaces in reverse order
-        # last resent interfaces should replace 
-        # older signatures
-        imethods = {}
-        imethods_from_iface = {}
-        for iface in all_interfaces[::-1]:
-            ims = iface.__interface_methods__
-            imethods.update(ims)
-            imethods_from_iface.update(dict((name, iface) 
-                                        for name in ims.keys()))
-        
+            inherited = []
+            table = {}
+
+        seen = set(inherited)
+        own = []
+        for iface in cdict.get('__implements__', []):
+            if iface not in seen:
+                seen.add(iface)
+                own.append(iface)
+
+        others = []
+        for base in bases:
+            if base is first:
+                continue
+
+            if isinstance(base, ImplementsMeta):
+                base_ifaces = base.__all_interfaces__
+            else:
+                base_ifaces = []
+                for curr_cls in base.__mro__:
+                    base_ifaces.extend(curr_cls.__dict__.get('__implements__',
+                                                             []))
+
+            for iface in base_ifaces:
+                if iface not in seen:
+                    seen.add(iface)
+                    others.append(iface)
+
+        changed = set()
+        if own or others:
+            table = table.copy()
+
+            for iface in own[::-1]:
+                for fname, func in iface.__interface_methods__.items():
+                    table[fname] = ((iface, func),) + table.get(fname, ())
+                    changed.add(fname)
+
+            for iface in others:
+                for fname, func in iface.__interface_methods__.items():
+                    table[fname] = table.get(fname, ()) + ((iface, func),)
+                    changed.add(fname)
+
+        all_interfaces = own + list(inherited) + others
+
+        if len(bases) != 1 or bases[0] is not first:
+            # methods can came from any base
+            names = None
+        else:
+            names = changed
+            names.update(fname for fname in cdict if fname in table)
+
+        return all_interfaces, table, names, bool(own or others)
+
+    @classmethod
+    def guard_methods(cls, impl_cls, table, names, originals, trusted):
         # check, that all not checked before functions have signatures,
-        # which consistent to interfaces signatures
+        # which consistent to interfaces signatures, and create guards
+        # for them. originals - class own methods, which are replaced 
+        # by LazyGuard's
+        if names is None:
+            names = table.keys()
+
+        guarded_methods = {}
 
-        for fname, iface_func in imethods.items():
-            impl_func = getattr(tempo_cls, fname, None)
-            if impl_func is None:
+        for fname in names:
+            entries = table[fname]
+            iface, iface_func = entries[0]
+
+            if fname in originals:
+                owner, val = impl_cls, originals[fname]
+            else:
+                owner, val = find_in_mro(impl_cls, fname)
+
+            if owner is None or isinstance(val, LazyGuard):
                 raise AssertionError("Method {0} is not implemented".\
                                 format(fname))
-            # if checked and checked over correct interface
-            signature_checked_over = getattr(impl_func, 
-                                             '__signature_checked__', None)
-            if signature_checked_over != imethods_from_iface[fname]:
-                # check and update all new functions to checked functions
-                # and ones from based, not updated before
-
-                # take original function, without check wrapper
-                impl_func = getattr(impl_func, '__real_func__', impl_func)
-                impl_func = getattr(impl_func, 'im_func', impl_func)
-
-                check_signature_acceptable(iface_func, impl_func,
-                                           iface_no_self=True)
-                
-                cdict[fname] = check_and_call(iface_func, impl_func)
-                cdict[fname].__signature_checked__ = signature_checked_over
-        
-        cdict['__all_interfaces__'] = all_interfaces
-                
-        # create class
-        new_cls = super(ImplementsMeta, cls).__new__(cls, name, bases, cdict)
-        
+
+            # method, already guarded by base over the same interface
+            if owner is not impl_cls:
+                guard = owner.__dict__.get('__guarded_methods__', {}).\
+                                                            get(fname)
+                if guard is not None and \
+                        guard.iface_func is iface_func and \
+                        getattr(val, '__real_func__', val) is guard.real_func:
+                    continue
+
+            if hasattr(val, '__get__'):
+                impl_func = val.__get__(None, impl_cls)
+            else:
+                impl_func = val
+
+            # take original function, without check wrapper
+            impl_func = getattr(impl_func, '__real_func__', impl_func)
+            impl_func = getattr(impl_func, 'im_func', impl_func)
+
+            if not trusted:
+                for _, curr_iface_func in entries:
+                    check_signature_acceptable(curr_iface_func, impl_func,
+                                               iface_no_self=True)
+            
+            guard = GuardedMethod(fname, iface, iface_func, impl_func)
+            guarded_methods[fname] = guard
+
+        return guarded_methods
+
+    @classmethod
+    def is_trusted(cls, module, name, bases, all_interfaces):
+        # classes, verified at build time, are not checked again
+        return manifest.current is not None and \
+                    manifest.is_verified(module, name, bases, all_interfaces)
+
+    @classmethod
+    def after_init_check(cls, new_cls, all_interfaces):
         # call __after_init_check__ check's of interfaces 
         for iface in all_interfaces:
             if hasattr(iface, "__after_init_check__"):
                 iface.__after_init_check__(new_cls)
-                    
+
+    def __new__(cls, name, bases, cdict):
+        global registry_version
+
+        # not verified bases should be verified before class, which
+        # takes methods from them
+        if pending_classes:
+            for base in bases:
+                verify_class(base)
+
+        all_interfaces, table, names, iface_set_changed = \
+                                    cls.resolve_interfaces(bases, cdict)
+
+        lazy = cdict.get('__lazy_check__', LAZY_CHECK)
+        originals = {}
+
+        if lazy:
+            # interface methods are replaced with LazyGuard placeholders,
+            # which verify class on first access
+            for fname in (table if names is None else names):
+                if fname in cdict:
+                    originals[fname] = cdict[fname]
+                cdict[fname] = LazyGuard(fname)
+
+            if '__new__' not in cdict:
+                cdict['__new__'] = lazy_new
+
+            cdict['__lazy_pending__'] = LazyPending(names, iface_set_changed,
+                                                    originals)
+
+        cdict['__all_interfaces__'] = all_interfaces
+        cdict['__interface_table__'] = table
+        cdict['__guarded_methods__'] = {}
+        cdict['__provided_interfaces__'] = \
+                                cls.provided_interfaces(all_interfaces)
+
+        new_cls = super(ImplementsMeta, cls).__new__(cls, name, bases, cdict)
+
+        if lazy:
+            pending_classes.add(new_cls)
+        else:
+            cls.verify(new_cls, names, iface_set_changed, originals)
+
+        # only verified or lazy classes are registered
+        registry_version += 1
+        for iface in new_cls.__provided_interfaces__:
+            impls = implementations.get(iface)
+            if impls is None:
+                impls = implementations[iface] = weakref.WeakSet()
+            impls.add(new_cls)
+
         return new_cls
-        
+
+    @classmethod
+    def provided_interfaces(cls, all_interfaces):
+        # interfaces and their base interfaces
+        res = set()
+        for iface in all_interfaces:
+            res.update(base for base in iface.__mro__
+                            if isinstance(base, InterfaceMeta))
+        return frozenset(res)
+
+    @classmethod
+    def verify(cls, impl_cls, names, iface_set_changed, originals):
+        # check class and install guards for interface methods
+        all_interfaces = impl_cls.__all_interfaces__
+        trusted = cls.is_trusted(impl_cls.__module__, impl_cls.__name__,
+                                 impl_cls.__bases__, all_interfaces)
+
+        # check interface set consistency - no duplicated functions from
+        # different inheritance path's
+        if iface_set_changed and not trusted and \
+                not impl_cls.__dict__.get('__no_interfaces_consistency_check__',
+                                          False):
+            verified = ()
+            for base in impl_cls.__bases__:
+                if isinstance(base, ImplementsMeta):
+                    verified = base.__all_interfaces__
+                    break
+            cls.check_interfaces_consistency(all_interfaces, verified)
+
+        guarded_methods = cls.guard_methods(impl_cls,
+                                            impl_cls.__interface_table__,
+                                            names, originals, trusted)
+
+        for fname, val in originals.items():
+            if fname not in guarded_methods:
+                setattr(impl_cls, fname, val)
+
+        for fname, guard in guarded_methods.items():
+            guard.owner = weakref.ref(impl_cls)
+            setattr(impl_cls, fname, guard.get_func())
+
+        impl_cls.__guarded_methods__ = guarded_methods
+
+        cls.after_init_check(impl_cls, all_interfaces)
+
+        # rejected classes never get here
+        implementation_classes.add(impl_cls)
+
+    @classmethod
+    def verify_pending(cls, impl_cls, pending):
+        # checks and wrappers, delayed for lazy class
+        cls.verify(impl_cls, pending.names, pending.iface_set_changed,
+                   pending.originals)
+
+        # placeholders for methods, guarded in bases
+        for fname, val in impl_cls.__dict__.items():
+            if isinstance(val, LazyGuard):
+                delattr(impl_cls, fname)
+
+        del impl_cls.__lazy_pending__
+        pending_classes.discard(impl_cls)
+
+        if impl_cls.__dict__.get('__new__') is lazy_new:
+            del impl_cls.__new__
+
+def find_in_mro(impl_cls, name):
+    # (class, value) for class attribute, without descriptors call
+    for curr_cls in impl_cls.__mro__:
+        if name in curr_cls.__dict__:
+            return curr_cls, curr_cls.__dict__[name]
+    return None, None
+
+# classes, created in lazy mode and not verified yet
+pending_classes = weakref.WeakSet()
+
+class LazyPending(object):
+    # all, what is required to verify lazy class later
+    def __init__(self, names, iface_set_changed, originals):
+        self.names = names
+        self.iface_set_changed = iface_set_changed
+        self.originals = originals
+
+class LazyGuard(object):
+    # placeholder for interface method of not verified class
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, obj, tp=None):
+        if tp is None:
+            tp = type(obj)
+
+        verify_class(tp)
+
+        _, val = find_in_mro(tp, self.name)
+        if val is None or isinstance(val, LazyGuard):
+            raise AttributeError(self.name)
+
+        if hasattr(val, '__get__'):
+            return val.__get__(obj, tp)
+        return val
+
+def lazy_new_func(impl_cls, *dt, **mp):
+    verify_class(impl_cls)
+    return impl_cls.__new__(impl_cls, *dt, **mp)
+
+lazy_new = staticmethod(lazy_new_func)
+
+# taken only while verifying lazy classes, reentrant - checks can
+# use other lazy classes
+lazy_lock = threading.RLock()
+
+def verify_class(impl_cls):
+    # run delayed checks for class and all its bases, other threads
+    # wait, till class is verified
+    for curr_cls in reversed(impl_cls.__mro__):
+        if '__lazy_pending__' in curr_cls.__dict__:
+            with lazy_lock:
+                pending = curr_cls.__dict__.get('__lazy_pending__')
+                if pending is not None:
+                    type(curr_cls).verify_pending(curr_cls, pending)
+
+def verify_all():
+    # run delayed checks for all lazy classes
+    for impl_cls in list(pending_classes):
+        verify_class(impl_cls)
+
+# reducer for methods, registered before this module import
+other_reduce_method = copy_reg.dispatch_table.get(types.MethodType)
+
+def reduce_method(method):
+    # methods of implementation classes are pickled by reference -
+    # object or class and method name, other methods are left to
+    # reducer, registered before, or are not picklable
+    owner = method.im_class if method.im_self is None else method.im_self
+    if not isinstance(method.im_class, ImplementsMeta):
+        if other_reduce_method is not None:
+            return other_reduce_method(method)
+        raise TypeError("can't pickle instancemethod objects")
+
+    name = getattr(method.im_func, '__guarded_name__',
+                   method.im_func.__name__)
+    return getattr, (owner, name)
+
+copy_reg.pickle(types.MethodType, reduce_method)
+
+def provides(obj, iface):
+    # obj is implementation class or its instance
+    cls = obj if isinstance(obj, ImplementsMeta) else type(obj)
+    return iface in getattr(cls, '__provided_interfaces__', ())
+
+def implementations_of(iface):
+    # all alive classes, which provide interface
+    return set(implementations.get(iface, ()))
+
+def set_lazy_check(enabled):
+    # create new implementation classes in lazy mode
+    global LAZY_CHECK
+    LAZY_CHECK = enabled
+
 class ImplementsBase(object):
     __metaclass__ = ImplementsMeta
 
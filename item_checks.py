@@ -0,0 +1,32 @@
+class ItemContract(object):
+    # check of items, yielded by iterator, which is returned
+    # from interface method. Only every-th item is checked and
+    # no more, than max_items items in total, None - no limit
+    def __init__(self, check, every=1, max_items=None):
+        self.check = check
+        self.every = every
+        self.max_items = max_items
+
+    def wrap(self, items):
+        return checked_items(iter(items), self.check,
+                             self.every, self.max_items)
+
+def checked_items(items, check, every, max_items):
+    # items are checked, when consumer pulls them, so
+    # nothing is stored and not consumed items are not checked
+    countdown = 1
+    checked = 0
+    for item in items:
+        countdown -= 1
+        if countdown == 0:
+            check(item)
+            checked += 1
+            countdown = every
+        yield item
+
+        if checked == max_items:
+            break
+
+    # rest is passed as is
+    for item in items:
+        yield item
@@ -0,0 +1,180 @@
+import os
+import sys
+import json
+import hashlib
+import pkgutil
+import argparse
+import importlib
+
+# Manifest of implementation classes, verified at build time.
+# Format - {module name : {'hash' : source hash,
+#                          'depends' : {module name : source hash},
+#                          'classes' : {class name : [shape, ...]}}}
+# 'depends' contains modules of all interfaces and bases of classes.
+# shape - [[interface id, ...], [base id, ...]], id is 'module.name',
+# the same name can be used by different classes, made by factory.
+# Class is trusted if it has one of verified shapes and its module and
+# all dependencies have the same hashes, as at build time.
+
+MANIFEST_ENV = 'INTERFACES_MANIFEST'
+
+# loaded manifest, None if not used
+current = None
+
+# module name => source hash, hash is calculated once per process
+module_hashes = {}
+
+def source_file(module):
+    fname = getattr(module, '__file__', None)
+    if fname is None:
+        return None
+
+    if fname.endswith(('.pyc', '.pyo')) and os.path.exists(fname[:-1]):
+        return fname[:-1]
+
+    return fname
+
+def module_hash(module_name):
+    try:
+        return module_hashes[module_name]
+    except KeyError:
+        pass
+
+    fname = source_file(sys.modules.get(module_name))
+    if fname is None or not os.path.isfile(fname):
+        res = None
+    else:
+        with open(fname, 'rb') as fd:
+            res = hashlib.sha1(fd.read()).hexdigest()
+
+    module_hashes[module_name] = res
+    return res
+
+def class_id(cls):
+    return "{0}.{1}".format(cls.__module__, cls.__name__)
+
+def class_shape(bases, interfaces):
+    return [[class_id(iface) for iface in interfaces],
+            [class_id(base) for base in bases]]
+
+def class_dependencies(bases, interfaces):
+    # base interfaces are included - their methods are checked too
+    modules = set()
+    for iface in interfaces:
+        for cls in iface.__mro__:
+            modules.add(cls.__module__)
+    for base in bases:
+        for cls in base.__mro__:
+            modules.add(cls.__module__)
+    return modules
+
+def load(fname):
+    with open(fname) as fd:
+        use(json.load(fd))
+
+def use(data):
+    # can be used as initializer of multiprocessing pool, with
+    # verified_manifest() from parent process as argument
+    global current
+    current = data
+
+def is_verified(module_name, class_name, bases, interfaces):
+    # check, that class with the same interfaces and bases was verified
+    # at build time and nothing it depends on changed since
+    if current is None:
+        return False
+
+    entry = current.get(module_name)
+    if entry is None or class_shape(bases, interfaces) not in \
+            entry['classes'].get(class_name, ()):
+        return False
+
+    if entry['hash'] is None or entry['hash'] != module_hash(module_name):
+        return False
+
+    depends = entry['depends']
+    for dep in class_dependencies(bases, interfaces):
+        if dep == module_name:
+            continue
+        if dep not in depends or depends[dep] != module_hash(dep):
+            return False
+
+    return True
+
+def build(classes):
+    # make manifest for classes, which was created with full checks
+    res = {}
+    for impl_cls in classes:
+        module_name = impl_cls.__module__
+        entry = res.get(module_name)
+        if entry is None:
+            entry = res[module_name] = {'hash' : module_hash(module_name),
+                                        'depends' : {},
+                                        'classes' : {}}
+
+        deps = class_dependencies(impl_cls.__bases__,
+                                  impl_cls.__all_interfaces__)
+        for dep in deps:
+            if dep != module_name:
+                entry['depends'][dep] = module_hash(dep)
+
+        shapes = entry['classes'].setdefault(impl_cls.__name__, [])
+        shape = class_shape(impl_cls.__bases__, impl_cls.__all_interfaces__)
+        if shape not in shapes:
+            shapes.append(shape)
+
+    for entry in res.values():
+        for shapes in entry['classes'].values():
+            shapes.sort()
+
+    return res
+
+def verified_classes():
+    # classes, which are already checked in this process
+    import interfaces
+    return [impl_cls for impl_cls in interfaces.implementation_classes
+                if impl_cls.__module__ != 'interfaces' and
+                   '__lazy_pending__' not in impl_cls.__dict__]
+
+def verified_manifest():
+    # manifest for worker processes, so classes, checked in parent,
+    # are not checked again on import in workers
+    return build(verified_classes())
+
+def import_all(module_names):
+    for name in module_names:
+        module = importlib.import_module(name)
+        if hasattr(module, '__path__'):
+            for _, subname, _ in pkgutil.walk_packages(module.__path__,
+                                                       name + '.'):
+                importlib.import_module(subname)
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+                description="Verify implementation classes and store manifest")
+    parser.add_argument('-o', '--output', required=True,
+                        help="manifest file")
+    parser.add_argument('modules', nargs='+',
+                        help="modules and packages to verify")
+    return parser.parse_args(argv)
+
+def main(argv):
+    opts = parse_args(argv[1:])
+
+    # all checks are done on import, so no manifest should be used
+    import manifest
+    import interfaces
+    manifest.current = None
+    import_all(opts.modules)
+    interfaces.verify_all()
+
+    with open(opts.output, 'w') as fd:
+        json.dump(verified_manifest(), fd, indent=4, sort_keys=True)
+
+    return 0
+
+if os.environ.get(MANIFEST_ENV):
+    load(os.environ[MANIFEST_ENV])
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,122 @@
+import math
+
+from per_thread import PerThread
+
+class Histogram(object):
+    # log2 histogram of time intervals, bucket N counts
+    # intervals in [2 ** (N - 1), 2 ** N) seconds, bucket None -
+    # zero intervals, shorter, than timer resolution
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.buckets = {}
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+
+        if self.min is None or value < self.min:
+            self.min = value
+
+        if self.max is None or value > self.max:
+            self.max = value
+
+        bucket = math.frexp(value)[1] if value > 0 else None
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+
+        for val in (other.min, other.max):
+            if val is not None:
+                if self.min is None or val < self.min:
+                    self.min = val
+                if self.max is None or val > self.max:
+                    self.max = val
+
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+
+    def snapshot(self):
+        return {'count' : self.count,
+                'total' : self.total,
+                'min' : self.min,
+                'max' : self.max,
+                'buckets' : dict((0.0 if bucket is None else 2.0 ** bucket,
+                                  count)
+                                    for bucket, count in self.buckets.items())}
+
+class MethodStatsShard(object):
+    # statistic, collected by one thread
+    def __init__(self):
+        self.pre_time = Histogram()
+        self.body_time = Histogram()
+        self.post_time = Histogram()
+        self.reset()
+
+    def reset(self):
+        self.calls = 0
+        self.unchecked_calls = 0
+        self.pre_failures = 0
+        self.post_failures = 0
+        self.pre_time.reset()
+        self.body_time.reset()
+        self.post_time.reset()
+
+    def merge(self, other):
+        self.calls += other.calls
+        self.unchecked_calls += other.unchecked_calls
+        self.pre_failures += other.pre_failures
+        self.post_failures += other.post_failures
+        self.pre_time.merge(other.pre_time)
+        self.body_time.merge(other.body_time)
+        self.post_time.merge(other.post_time)
+
+class MethodStats(object):
+    # statistic for one guarded method of implementation class,
+    # every thread writes to own shard, so no locks are needed
+    def __init__(self):
+        self.shards = PerThread(MethodStatsShard)
+
+    def reset(self):
+        for shard in self.shards.all():
+            shard.reset()
+
+    def record(self, pre_time, body_time, post_time):
+        shard = self.shards.get()
+        shard.calls += 1
+        shard.pre_time.add(pre_time)
+        shard.body_time.add(body_time)
+        shard.post_time.add(post_time)
+
+    def unchecked(self):
+        self.shards.get().unchecked_calls += 1
+
+    def pre_failed(self):
+        shard = self.shards.get()
+        shard.calls += 1
+        shard.pre_failures += 1
+
+    def post_failed(self):
+        shard = self.shards.get()
+        shard.calls += 1
+        shard.post_failures += 1
+
+    def snapshot(self):
+        res = MethodStatsShard()
+        for shard in self.shards.all():
+            res.merge(shard)
+
+        return {'calls' : res.calls,
+                'unchecked_calls' : res.unchecked_calls,
+                'pre_failures' : res.pre_failures,
+                'post_failures' : res.post_failures,
+                'pre_time' : res.pre_time.snapshot(),
+                'body_time' : res.body_time.snapshot(),
+                'post_time' : res.post_time.snapshot()}
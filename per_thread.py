@@ -0,0 +1,75 @@
+import weakref
+import threading
+
+# Lock free per-thread state for runtime path of guard wrappers.
+# Every thread updates only its own shard, shards are merged, when
+# statistic is requested.
+
+class ThreadSentinel(object):
+    # kept in thread local storage, so it's released, when thread ends
+    pass
+
+class PerThread(object):
+    # per-thread instances of factory(), shards should have
+    # merge(other) method. Shard of finished thread is merged to
+    # retired one, so its data are not lost and count of shards
+    # is limited by count of alive threads
+    def __init__(self, factory):
+        self.factory = factory
+        self.local = threading.local()
+        # reentrant - retire can be called by garbage collector
+        # in any thread
+        self.lock = threading.RLock()
+        # weak reference to thread sentinel => shard
+        self.shards = {}
+        self.retired = factory()
+
+    def get(self):
+        try:
+            return self.local.shard
+        except AttributeError:
+            return self.add_shard()
+
+    def add_shard(self):
+        shard = self.local.shard = self.factory()
+        sentinel = self.local.sentinel = ThreadSentinel()
+        with self.lock:
+            self.shards[weakref.ref(sentinel, self.retire)] = shard
+        return shard
+
+    def retire(self, ref):
+        # new object, so lists, returned by all() before, don't
+        # count the shard twice
+        with self.lock:
+            shard = self.shards.pop(ref, None)
+            if shard is not None:
+                retired = self.factory()
+                retired.merge(self.retired)
+                retired.merge(shard)
+                self.retired = retired
+
+    def all(self):
+        with self.lock:
+            return list(self.shards.values()) + [self.retired]
+
+class Counters(object):
+    # named integer counters of one thread
+    def __init__(self, names):
+        for name in names:
+            setattr(self, name, 0)
+
+    def merge(self, other):
+        for name, val in other.__dict__.items():
+            setattr(self, name, getattr(self, name) + val)
+
+def counters(*names):
+    return PerThread(lambda: Counters(names))
+
+def total(per_thread, name):
+    return sum(getattr(shard, name) for shard in per_thread.all())
+
+def reset(per_thread):
+    # values, added by other threads during reset, can survive it
+    for shard in per_thread.all():
+        for name in shard.__dict__:
+            setattr(shard, name, 0)
@@ -0,0 +1,795 @@
+import os
+import sys
+import ast
+import json
+import hashlib
+import argparse
+import multiprocessing
+
+from check_func_iface import ArgSpec, check_argspec_acceptable
+import manifest
+
+# Static verification of interfaces and implementations. Sources are
+# parsed, but not executed, and the same rules, as ImplementsMeta
+# uses on import, are applied to classes, found in them:
+#   - all interface methods are implemented
+#   - implementation signatures are acceptable for all interfaces
+#     methods, which they implement
+#   - interfaces sets of classes are consistent
+# Files are summarized in process pool, summaries are cached by source
+# hash, so only changed files are parsed again. Classes, which can't be
+# verified statically (unknown bases, decorated methods, etc) are
+# reported and never get into manifest.
+
+CACHE_VERSION = 3
+
+INTERFACE = 'interfaces.Interface'
+IMPLEMENTS_BASE = 'interfaces.ImplementsBase'
+OBJECT = '__builtin__.object'
+
+# decorators, which return the same function
+interface_decorators = set(['pre', 'post', 'contract', 'check_types',
+                            'cache_check', 'check_items', 'check_arrays',
+                            'do_check_me', 'do_not_check_me'])
+implementation_decorators = set(['do_check_me', 'do_not_check_me'])
+
+# decorators, after which value is not a function
+not_function_decorators = set(['staticmethod', 'classmethod', 'property'])
+
+def file_hash(path):
+    with open(path, 'rb') as fd:
+        return hashlib.sha1(fd.read()).hexdigest()
+
+def module_name(path):
+    # dotted name, from the top most package, containing file
+    path = os.path.abspath(path)
+    dname, fname = os.path.split(path)
+    parts = [] if fname == '__init__.py' else [os.path.splitext(fname)[0]]
+
+    while os.path.isfile(os.path.join(dname, '__init__.py')):
+        dname, pkg = os.path.split(dname)
+        parts.insert(0, pkg)
+
+    return ".".join(parts)
+
+def find_sources(paths):
+    # [(path, module name)]
+    res = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dname, dirs, files in os.walk(path):
+                dirs.sort()
+                for fname in sorted(files):
+                    if fname.endswith('.py'):
+                        fpath = os.path.join(dname, fname)
+                        res.append((fpath, module_name(fpath)))
+        else:
+            res.append((path, module_name(path)))
+    return res
+
+def dotted_name(node):
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        base = dotted_name(node.value)
+        return None if base is None else base + '.' + node.attr
+    return None
+
+def decorator_name(node):
+    if isinstance(node, ast.Call):
+        node = node.func
+    name = dotted_name(node)
+    return None if name is None else name.split('.')[-1]
+
+def default_value(node):
+    # literal value, raises ValueError for other expressions - their
+    # values are known only at runtime
+    try:
+        val = ast.literal_eval(node)
+        json.dumps(val)
+        return val
+    except (ValueError, TypeError):
+        raise ValueError("not literal default value")
+
+def func_info(node):
+    # signature of function or lambda, in json friendly form
+    decorators = getattr(node, 'decorator_list', [])
+    info = {'lineno' : node.lineno,
+            'decorators' : [decorator_name(dec) for dec in decorators]}
+
+    args = []
+    for arg in node.args.args:
+        name = getattr(arg, 'arg', None) or getattr(arg, 'id', None)
+        if name is None:
+            # tuple unpacking in arguments list
+            info['unknown'] = "unsupported arguments list"
+            return info
+        args.append(name)
+
+    vararg = node.args.vararg
+    kwarg = node.args.kwarg
+    info['args'] = args
+    info['varargs'] = getattr(vararg, 'arg', vararg)
+    info['keywords'] = getattr(kwarg, 'arg', kwarg)
+    try:
+        info['defaults'] = [default_value(val)
+                                for val in node.args.defaults] \
+                                    if node.args.defaults else None
+    except ValueError as exc:
+        info['unknown'] = str(exc)
+    return info
+
+def class_info(node):
+    info = {'lineno' : node.lineno,
+            'bases' : [dotted_name(base) for base in node.bases],
+            'implements' : [],
+            'all_interfaces' : False,
+            'no_consistency_check' : False,
+            'methods' : {}}
+
+    methods = info['methods']
+    for stmt in node.body:
+        if isinstance(stmt, ast.FunctionDef):
+            methods[stmt.name] = func_info(stmt)
+            continue
+
+        if not isinstance(stmt, ast.Assign):
+            continue
+
+        for target in stmt.targets:
+            if not isinstance(target, ast.Name):
+                continue
+
+            name = target.id
+            value = stmt.value
+            if name == '__implements__':
+                if isinstance(value, (ast.List, ast.Tuple)):
+                    info['implements'] = [dotted_name(elt)
+                                                for elt in value.elts]
+                else:
+                    info['implements'] = None
+            elif name == '__all_interfaces__':
+                info['all_interfaces'] = True
+            elif name == '__no_interfaces_consistency_check__':
+                try:
+                    info['no_consistency_check'] = \
+                                    bool(ast.literal_eval(value))
+                except ValueError:
+                    info['no_consistency_check'] = None
+            elif isinstance(value, ast.Lambda):
+                methods[name] = func_info(value)
+            elif isinstance(value, ast.Name) and value.id in methods:
+                # alias of method, defined above
+                methods[name] = methods[value.id]
+            else:
+                methods[name] = {'lineno' : stmt.lineno,
+                                 'value' : True}
+                try:
+                    ast.literal_eval(value)
+                except ValueError:
+                    # can be function, known only at runtime
+                    methods[name]['unknown'] = "not literal value"
+    return info
+
+def summarize(path, module):
+    # everything, what is required for verification, from one file
+    res = {'module' : module,
+           'path' : path,
+           'is_package' : os.path.basename(path) == '__init__.py',
+           'imports' : {},
+           'classes' : {}}
+
+    try:
+        with open(path, 'rb') as fd:
+            tree = ast.parse(fd.read(), path)
+    except (SyntaxError, TypeError) as exc:
+        res['error'] = "can't parse: {0}".format(exc)
+        return res
+
+    package = module if res['is_package'] else module.rpartition('.')[0]
+
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            res['classes'][node.name] = class_info(node)
+        elif isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.asname is not None:
+                    res['imports'][alias.asname] = [alias.name, None]
+                else:
+                    top = alias.name.split('.')[0]
+                    res['imports'][top] = [top, None]
+        elif isinstance(node, ast.ImportFrom):
+            base = node.module or ''
+            if node.level:
+                pkg_parts = package.split('.') if package else []
+                pkg_parts = pkg_parts[:len(pkg_parts) - (node.level - 1)]
+                base = ".".join(pkg_parts + ([base] if base else []))
+
+            for alias in node.names:
+                res['imports'][alias.asname or alias.name] = [base,
+                                                              alias.name]
+    return res
+
+def summarize_item(item):
+    path, module = item
+    return path, summarize(path, module)
+
+def load_cache(fname):
+    if fname is None or not os.path.isfile(fname):
+        return {}
+
+    with open(fname) as fd:
+        data = json.load(fd)
+
+    if data.get('version') != CACHE_VERSION:
+        return {}
+    return data['files']
+
+def store_cache(fname, files):
+    with open(fname, 'w') as fd:
+        json.dump({'version' : CACHE_VERSION, 'files' : files}, fd)
+
+def load_summaries(paths, cache_file=None, jobs=None):
+    # ({module name : summary}, {module name : source hash},
+    #  count of parsed files)
+    sources = find_sources(paths)
+    cache = load_cache(cache_file)
+
+    hashes = {}
+    cached = {}
+    changed = []
+    for path, module in sources:
+        key = os.path.abspath(path)
+        hashes[key] = file_hash(path)
+        entry = cache.get(key)
+        if entry is not None and entry['hash'] == hashes[key] and \
+                entry['summary']['module'] == module:
+            cached[key] = entry['summary']
+        else:
+            changed.append((path, module))
+
+    if jobs == 1 or len(changed) < 2:
+        parsed = list(map(summarize_item, changed))
+    else:
+        pool = multiprocessing.Pool(jobs)
+        try:
+            parsed = pool.map(summarize_item, changed)
+        finally:
+            pool.close()
+            pool.join()
+
+    for path, summary in parsed:
+        # the same form, as after cache reload
+        cached[os.path.abspath(path)] = json.loads(json.dumps(summary))
+
+    if cache_file is not None:
+        store_cache(cache_file, dict((key, {'hash' : hashes[key],
+                                            'summary' : summary})
+                                        for key, summary in cached.items()))
+
+    summaries = {}
+    module_hashes = {}
+    for key, summary in cached.items():
+        summaries[summary['module']] = summary
+        module_hashes[summary['module']] = hashes[key]
+
+    return summaries, module_hashes, len(changed)
+
+class Unverifiable(Exception):
+    pass
+
+class Verifier(object):
+    # applies ImplementsMeta rules to summaries of modules
+    def __init__(self, summaries):
+        self.summaries = summaries
+        self.mro_cache = {}
+        self.resolved = {}
+        self.methods_cache = {}
+        self.implementation_cache = {}
+
+    # names resolution
+
+    def resolve(self, module, name):
+        # class id ('module.Class') for dotted name, used in module
+        if name is None:
+            raise Unverifiable("not a name expression")
+
+        key = (module, name)
+        if key not in self.resolved:
+            self.resolved[key] = self.resolve_uncached(module, name)
+        return self.resolved[key]
+
+    def resolve_uncached(self, module, name):
+        parts = name.split('.')
+        summary = self.summaries.get(module)
+        first = parts[0]
+
+        if summary is not None and first in summary['classes']:
+            if len(parts) != 1:
+                raise Unverifiable("nested class {0}".format(name))
+            return module + '.' + first
+
+        if summary is not None and first in summary['imports']:
+            target, attr = summary['imports'][first]
+            if attr is not None:
+                if len(parts) == 1:
+                    return self.resolve_in_module(target, attr, set())
+                target = target + '.' + attr
+                parts = parts[1:]
+            else:
+                parts = parts[1:]
+                if target == first:
+                    # 'import a.b' binds 'a', b is a submodule
+                    while len(parts) > 1 and \
+                            target + '.' + parts[0] in self.summaries:
+                        target = target + '.' + parts[0]
+                        parts = parts[1:]
+
+            if len(parts) != 1:
+                raise Unverifiable("can't resolve {0}".format(name))
+            return self.resolve_in_module(target, parts[0], set())
+
+        if name == 'object':
+            return OBJECT
+
+        raise Unverifiable("can't resolve {0}".format(name))
+
+    def resolve_in_module(self, module, name, seen):
+        if (module, name) in seen:
+            raise Unverifiable("import cycle for {0}.{1}".format(module, name))
+        seen.add((module, name))
+
+        full = module + '.' + name
+        if full in (INTERFACE, IMPLEMENTS_BASE):
+            return full
+
+        summary = self.summaries.get(module)
+        if summary is None:
+            raise Unverifiable("{0} is not in verified sources".format(full))
+
+        if name in summary['classes']:
+            return full
+
+        if name in summary['imports']:
+            target, attr = summary['imports'][name]
+            if attr is not None:
+                return self.resolve_in_module(target, attr, seen)
+
+        raise Unverifiable("{0} is not a class".format(full))
+
+    def class_summary(self, cls_id):
+        module, _, name = cls_id.rpartition('.')
+        return self.summaries[module]['classes'][name]
+
+    def module_of(self, cls_id):
+        return cls_id.rpartition('.')[0]
+
+    def bases(self, cls_id):
+        if cls_id in (INTERFACE, IMPLEMENTS_BASE):
+            return [OBJECT]
+        if cls_id == OBJECT:
+            return []
+        return [self.resolve(self.module_of(cls_id), base)
+                    for base in self.class_summary(cls_id)['bases']]
+
+    def mro(self, cls_id):
+        # C3 linearization
+        if cls_id not in self.mro_cache:
+            self.mro_cache[cls_id] = None
+            bases = self.bases(cls_id)
+            seqs = [list(self.mro(base)) for base in bases] + [list(bases)]
+            res = [cls_id]
+            while True:
+                seqs = [seq for seq in seqs if seq]
+                if not seqs:
+                    break
+                for seq in seqs:
+                    head = seq[0]
+                    if not any(head in other[1:] for other in seqs):
+                        break
+                else:
+                    raise Unverifiable("inconsistent MRO for " + cls_id)
+                res.append(head)
+                for seq in seqs:
+                    if seq[0] == head:
+                        del seq[0]
+            self.mro_cache[cls_id] = res
+
+        if self.mro_cache[cls_id] is None:
+            raise Unverifiable("cyclic bases of " + cls_id)
+        return self.mro_cache[cls_id]
+
+    def is_interface(self, cls_id):
+        return INTERFACE in self.mro(cls_id)
+
+    def is_implementation(self, cls_id):
+        return IMPLEMENTS_BASE in self.mro(cls_id)
+
+    # InterfaceMeta
+
+    def interface_methods(self, cls_id):
+        # {name : (interface id, method info)}
+        if cls_id not in self.methods_cache:
+            self.methods_cache[cls_id] = self.find_interface_methods(cls_id)
+        return self.methods_cache[cls_id]
+
+    def find_interface_methods(self, cls_id):
+        if cls_id in (INTERFACE, OBJECT):
+            return {}
+
+        res = {}
+        for base in self.bases(cls_id):
+            if self.is_interface(base):
+                res.update(self.interface_methods(base))
+
+        for name, info in self.class_summary(cls_id)['methods'].items():
+            if 'value' in info:
+                # not function, InterfaceMeta ignores it
+                if 'unknown' in info and \
+                        not (name.startswith('__') and name.endswith('__')):
+                    raise Unverifiable("{0}.{1} at line {2} can be method".
+                                        format(cls_id, name, info['lineno']))
+                continue
+
+            decorators = info['decorators']
+            if not_function_decorators & set(decorators):
+                continue
+
+            if 'do_not_check_me' in decorators:
+                continue
+
+            if name.startswith('__') and name.endswith('__') and \
+                    'do_check_me' not in decorators:
+                continue
+
+            res[name] = (cls_id, info)
+        return res
+
+    # ImplementsMeta
+
+    def implementation(self, cls_id):
+        # (all interfaces, table, names, interfaces set changed), as
+        # returned by ImplementsMeta.resolve_interfaces. Results and
+        # errors are cached, so every class is resolved only once
+        if cls_id not in self.implementation_cache:
+            try:
+                res = self.resolve_implementation(cls_id)
+            except Unverifiable as exc:
+                res = exc
+            self.implementation_cache[cls_id] = res
+
+        res = self.implementation_cache[cls_id]
+        if isinstance(res, Unverifiable):
+            raise res
+        return res
+
+    def resolve_implementation(self, cls_id):
+        if cls_id == IMPLEMENTS_BASE:
+            return [], {}, set(), False
+
+        summary = self.class_summary(cls_id)
+        module = self.module_of(cls_id)
+
+        if summary['all_interfaces']:
+            raise Unverifiable("__all_interfaces__ is set explicitly")
+
+        if summary['implements'] is None:
+            raise Unverifiable("__implements__ is not a list")
+
+        bases = self.bases(cls_id)
+        first = None
+        for base in bases:
+            if self.is_implementation(base):
+                first = base
+                break
+
+        if first is not None:
+            inherited, table, _, _ = self.implementation(first)
+        else:
+            inherited, table = [], {}
+
+        seen = set(inherited)
+        own = []
+        for name in summary['implements']:
+            iface = self.resolve(module, name)
+            if iface not in seen:
+                seen.add(iface)
+                own.append(iface)
+
+        others = []
+        for base in bases:
+            if base == first:
+                continue
+
+            if self.is_implementation(base):
+                base_ifaces = self.implementation(base)[0]
+            else:
+                base_ifaces = []
+                for curr in self.mro(base):
+                    if curr in (OBJECT, INTERFACE, IMPLEMENTS_BASE):
+                        continue
+                    names = self.class_summary(curr)['implements'] or []
+                    base_ifaces.extend(self.resolve(self.module_of(curr), name)
+                                            for name in names)
+
+            for iface in base_ifaces:
+                if iface not in seen:
+                    seen.add(iface)
+                    others.append(iface)
+
+        changed = set()
+        if own or others:
+            table = dict(table)
+
+            for iface in own[::-1]:
+                for fname, entry in self.interface_methods(iface).items():
+                    table[fname] = (entry,) + table.get(fname, ())
+                    changed.add(fname)
+
+            for iface in others:
+                for fname, entry in self.interface_methods(iface).items():
+                    table[fname] = table.get(fname, ()) + (entry,)
+                    changed.add(fname)
+
+        all_interfaces = own + list(inherited) + others
+
+        if len(bases) != 1 or bases[0] != first:
+            names = set(table)
+        else:
+            names = changed
+            names.update(fname for fname in summary['methods']
+                            if fname in table)
+
+        return all_interfaces, table, names, bool(own or others)
+
+    def find_in_mro(self, cls_id, fname):
+        for curr in self.mro(cls_id):
+            if curr in (OBJECT, INTERFACE, IMPLEMENTS_BASE):
+                continue
+            methods = self.class_summary(curr)['methods']
+            if fname in methods:
+                return curr, methods[fname]
+        return None, None
+
+    def argspec(self, info):
+        if 'value' in info or 'unknown' in info:
+            raise Unverifiable("method at line {0} is not a plain function".
+                                            format(info['lineno']))
+        return ArgSpec(tuple(info['args']), info['varargs'],
+                       info['keywords'],
+                       None if info['defaults'] is None
+                            else tuple(info['defaults']))
+
+    def interface_argspec(self, entry):
+        iface, info = entry
+        if set(info['decorators']) - interface_decorators:
+            raise Unverifiable("{0} method at line {1} has unknown decorator".
+                                    format(iface, info['lineno']))
+        return self.argspec(info)
+
+    def check_consistency(self, cls_id, all_interfaces, verified):
+        fdict = {}
+        fname_to_iface = {}
+        verified = set(verified)
+
+        # the same order, as ImplementsMeta.check_interfaces_consistency
+        # uses
+        for iface in all_interfaces:
+            is_new = iface not in verified
+            for name, entry in self.interface_methods(iface).items():
+                if name in fdict and \
+                        (is_new or fname_to_iface[name] not in verified):
+                    try:
+                        check_argspec_acceptable(
+                                fdict[name][0] + '.' + name,
+                                self.interface_argspec(fdict[name]),
+                                iface + '.' + name,
+                                self.interface_argspec(entry))
+                    except AssertionError:
+                        raise AssertionError(
+                            "Interfaces {0} and {1} is inconsistent".format(
+                                    iface, fname_to_iface[name]))
+                fdict[name] = entry
+                fname_to_iface[name] = iface
+
+    def verify_class(self, cls_id):
+        # list of errors, raises Unverifiable
+        all_interfaces, table, names, changed = self.implementation(cls_id)
+        summary = self.class_summary(cls_id)
+
+        errors = []
+        if changed and not summary['no_consistency_check']:
+            if summary['no_consistency_check'] is None:
+                raise Unverifiable(
+                        "__no_interfaces_consistency_check__ is not literal")
+
+            verified = ()
+            for base in self.bases(cls_id):
+                if self.is_implementation(base):
+                    verified = self.implementation(base)[0]
+                    break
+            try:
+                self.check_consistency(cls_id, all_interfaces, verified)
+            except AssertionError as exc:
+                errors.append(str(exc))
+
+        for fname in sorted(names):
+            entries = table[fname]
+            owner, info = self.find_in_mro(cls_id, fname)
+
+            if owner is None:
+                errors.append("Method {0} is not implemented".format(fname))
+                continue
+
+            # already verified by base over the same interface method
+            if owner != cls_id:
+                owner_table = self.implementation(owner)[1]
+                if owner_table.get(fname, ())[:1] == entries[:1]:
+                    continue
+
+            if set(info.get('decorators', [])) - implementation_decorators:
+                raise Unverifiable("{0} has decorated method {1}".format(
+                                                            owner, fname))
+
+            impl_argspec = self.argspec(info)
+            for entry in entries:
+                try:
+                    check_argspec_acceptable(entry[0] + '.' + fname,
+                                             self.interface_argspec(entry),
+                                             owner + '.' + fname,
+                                             impl_argspec,
+                                             iface_no_self=True)
+                except AssertionError as exc:
+                    errors.append(str(exc))
+
+        return errors
+
+    def implementation_classes(self):
+        # classes with unresolved bases are taken only if they
+        # declare __implements__
+        res = []
+        for module, summary in sorted(self.summaries.items()):
+            for name, info in sorted(summary['classes'].items()):
+                cls_id = module + '.' + name
+                if cls_id in (INTERFACE, IMPLEMENTS_BASE):
+                    continue
+
+                try:
+                    if self.is_implementation(cls_id):
+                        res.append(cls_id)
+                except Unverifiable:
+                    if info['implements'] != []:
+                        res.append(cls_id)
+        return res
+
+    def verify(self):
+        # [{'class', 'path', 'line', 'errors', 'unverifiable'}]
+        res = []
+        for cls_id in self.implementation_classes():
+            summary = self.class_summary(cls_id)
+            record = {'class' : cls_id,
+                      'path' : self.summaries[self.module_of(cls_id)]['path'],
+                      'line' : summary['lineno'],
+                      'errors' : [],
+                      'unverifiable' : None}
+            try:
+                record['errors'] = self.verify_class(cls_id)
+            except Unverifiable as exc:
+                record['unverifiable'] = str(exc)
+            res.append(record)
+        return res
+
+    def dependencies(self, cls_id):
+        # the same modules, as manifest.class_dependencies returns
+        modules = set()
+        for iface in self.implementation(cls_id)[0]:
+            for curr in self.mro(iface):
+                modules.add(self.module_of(curr))
+        for base in self.bases(cls_id):
+            for curr in self.mro(base):
+                modules.add(self.module_of(curr))
+        return modules
+
+def dependency_hash(module, module_hashes):
+    if module in module_hashes:
+        return module_hashes[module]
+
+    # interfaces library itself, python builtins
+    __import__(module)
+    return manifest.module_hash(module)
+
+def build_manifest(verifier, records, module_hashes):
+    # manifest with classes, which are statically verified, in
+    # format of manifest.build
+    res = {}
+    for record in records:
+        if record['errors'] or record['unverifiable'] is not None:
+            continue
+
+        cls_id = record['class']
+        module, _, name = cls_id.rpartition('.')
+        entry = res.get(module)
+        if entry is None:
+            entry = res[module] = {'hash' : module_hashes[module],
+                                   'depends' : {},
+                                   'classes' : {}}
+
+        for dep in verifier.dependencies(cls_id):
+            if dep != module:
+                entry['depends'][dep] = dependency_hash(dep, module_hashes)
+
+        # shape of class, as manifest.class_shape makes
+        shape = [list(verifier.implementation(cls_id)[0]),
+                 verifier.bases(cls_id)]
+        entry['classes'][name] = [shape]
+
+    return res
+
+def report_lines(records, parse_errors):
+    lines = []
+    for path, error in parse_errors:
+        lines.append("{0}: error: {1}".format(path, error))
+
+    for record in records:
+        prefix = "{0}:{1}: {2}".format(record['path'], record['line'],
+                                       record['class'])
+        for error in record['errors']:
+            lines.append("{0}: error: {1}".format(prefix, error))
+        if record['unverifiable'] is not None:
+            lines.append("{0}: not verifiable: {1}".format(
+                                        prefix, record['unverifiable']))
+    return lines
+
+def verify_paths(paths, cache_file=None, jobs=None):
+    # (verifier, records, parse errors, module hashes, parsed files count)
+    summaries, module_hashes, parsed = load_summaries(paths, cache_file, jobs)
+    parse_errors = sorted((summary['path'], summary['error'])
+                            for summary in summaries.values()
+                                if 'error' in summary)
+    verifier = Verifier(summaries)
+    return verifier, verifier.verify(), parse_errors, module_hashes, parsed
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+                description="Verify implementation classes without importing")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="processes count, cpu count by default")
+    parser.add_argument('-c', '--cache', default=None,
+                        help="file to cache parsed sources in")
+    parser.add_argument('-m', '--manifest', default=None,
+                        help="manifest file for verified classes")
+    parser.add_argument('-r', '--report', default=None,
+                        help="json report file")
+    parser.add_argument('paths', nargs='+',
+                        help="source files and directories")
+    return parser.parse_args(argv)
+
+def main(argv):
+    opts = parse_args(argv[1:])
+
+    verifier, records, parse_errors, module_hashes, parsed = \
+                        verify_paths(opts.paths, opts.cache, opts.jobs)
+
+    for line in report_lines(records, parse_errors):
+        print(line)
+
+    errors = sum(1 for record in records if record['errors'])
+    unverifiable = sum(1 for record in records
+                            if record['unverifiable'] is not None)
+    print("{0} classes, {1} with errors, {2} not verifiable, "
+          "{3} files parsed".format(len(records), errors, unverifiable,
+                                    parsed))
+
+    if opts.report is not None:
+        with open(opts.report, 'w') as fd:
+            json.dump(records, fd, indent=4, sort_keys=True)
+
+    if opts.manifest is not None:
+        with open(opts.manifest, 'w') as fd:
+            json.dump(build_manifest(verifier, records, module_hashes), fd,
+                      indent=4, sort_keys=True)
+
+    return 1 if errors or parse_errors else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -1,10 +1,33 @@
+import gc
+import os
+import sys
+import time
+import pickle
+import threading
+import shutil
+import tempfile
 import unittest
 import contextlib
 
 from oktest import ok, test
 
 from interfaces import Interface, ImplementsBase, \
-                       check_signature_acceptable, do_check_me, do_not_check_me
+                       check_signature_acceptable, do_check_me, do_not_check_me, \
+                       enable_checks, disable_checks, set_sampling, \
+                       set_adaptive, set_instrumentation, stats_snapshot, \
+                       reset_stats, verify_all, pre, post, contract, \
+                       check_types, cache_check, check_cache_snapshot, \
+                       set_async_post, AsyncPostChecker, check_items, \
+                       check_arrays, ArraySpec, provides, implementations_of, \
+                       set_recording, CallRecorder
+import interfaces
+import manifest
+import adapters
+import static_verify
+import impl_bench
+import call_trace
+import per_thread
+import method_stats
 
 def not_check_signature_acceptable(iface_func, impl_func):
     try:
@@ -24,6 +47,21 @@ def raises(exc_tp):
     else:
         raise AssertionError("Exception %s haven't raised" % exc_tp)
 
+# classes should be accessible by name to be pickled
+class PicklableInterface(Interface):
+    def func(self, x):
+        ok(x) > 0
+
+class PicklableImpl(ImplementsBase):
+    __implements__ = [PicklableInterface]
+    def func(self, x):
+        return x
+    func2 = func
+
+class PlainPicklable(object):
+    def func(self):
+        return 1
+
 class InterfaceTester(unittest.TestCase):
 
     @test("function interface compatibility")
@@ -458,6 +496,1430 @@ class InterfaceTester(unittest.TestCase):
                     return -10
             len(Impl())
 
+    @test("generated wrapper follows interface signature")
+    def test_wrapper_signature(self):
+        class MyInterface(Interface):
+            def func(self, x, y=2, *dt, **mp):
+                ok(x).is_a(int)
+                res = yield
+                ok(res) == x + y + len(dt) + len(mp)
+
+            def func2(x):
+                ok(x).is_a(int)
+
+        class Impl(ImplementsBase):
+            __implements__ = [MyInterface]
+            def func(self, x, y=2, *dt, **mp):
+                return x + y + len(dt) + len(mp)
+
+            def func2(self, x):
+                return x
+
+        obj = Impl()
+
+        ok(obj.func(1)) == 3
+        ok(obj.func(x=1, y=3)) == 4
+        ok(obj.func(1, 2, 3, 4, z=5)) == 6
+        ok(obj.func2(x=7)) == 7
+        ok(Impl.func.__name__) == 'func'
+        ok(Impl.func.__real_func__.__name__) == 'func'
+
+        with raises(AssertionError):
+            obj.func2(x=None)
+
+
+    @test("switch runtime checks on and off")
+    def test_switch_checks(self):
+        class MyInterface(Interface):
+            def func(self, x):
+                ok(x).is_a(int)
+
+        class MyInterface2(Interface):
+            def func2(self, x):
+                ok(x).is_a(int)
+
+            def func3(self, x):
+                ok(x).is_a(int)
+
+        class Impl(ImplementsBase):
+            __implements__ = [MyInterface, MyInterface2]
+            def func(self, x):
+                return x
+
+            def func2(self, x):
+                return x
+
+            def func3(self, x):
+                return x
+
+        obj = Impl()
+        real_func = Impl.__dict__['func'].__real_func__
+
+        try:
+            disable_checks()
+            ok(Impl.__dict__['func']).is_(real_func)
+            obj.func(None)
+            obj.func2(None)
+
+            enable_checks()
+            with raises(AssertionError):
+                obj.func(None)
+
+            disable_checks(MyInterface2)
+            obj.func2(None)
+            obj.func3(None)
+            with raises(AssertionError):
+                obj.func(None)
+
+            enable_checks(MyInterface2, 'func3')
+            obj.func2(None)
+            with raises(AssertionError):
+                obj.func3(None)
+
+            disable_checks(method='func')
+            obj.func(None)
+        finally:
+            enable_checks()
+
+        with raises(AssertionError):
+            obj.func(None)
+
+
+    @test("sampled checks")
+    def test_sampling(self):
+        calls = []
+
+        class MyInterface(Interface):
+            def func(self, x):
+                calls.append(x)
+
+            def func2(self, x):
+                calls.append(x)
+
+        class Impl(ImplementsBase):
+            __implements__ = [MyInterface]
+            def func(self, x):
+                return x
+
+            def func2(self, x):
+                return x
+
+        obj = Impl()
+
+        try:
+            set_sampling(every=3, iface=MyInterface)
+            for i in range(7):
+                ok(obj.func(i)) == i
+            ok(calls) == [0, 3, 6]
+
+            del calls[:]
+            set_sampling(per_second=0.001, iface=MyInterface, method='func2')
+            for i in range(5):
+                ok(obj.func2(i)) == i
+            ok(calls) == [0]
+        finally:
+            set_sampling(iface=MyInterface, method='func2')
+            set_sampling(iface=MyInterface)
+
+        del calls[:]
+        obj.func(1)
+        obj.func(2)
+        ok(calls) == [1, 2]
+
+
+    @test("adaptive checks")
+    def test_adaptive(self):
+        calls = []
+
+        class MyInterface(Interface):
+            def func(self, x):
+                calls.append(x)
+                ok(x).is_a(int)
+
+        class Impl(ImplementsBase):
+            __implements__ = [MyInterface]
+            def func(self, x):
+                return x
+
+        obj = Impl()
+
+        try:
+            set_adaptive(iface=MyInterface, promote_after=3,
+                         sampling=('every', 2))
+            full_func = Impl.__dict__['func']
+
+            for i in range(3):
+                obj.func(i)
+            ok(Impl.__dict__['func']).is_not(full_func)
+
+            del calls[:]
+            adaptive = Impl.__guarded_methods__['func'].adaptive
+            generation = adaptive.generation
+            for i in range(4):
+                obj.func(i)
+            ok(calls) == [0, 2]
+
+            # sampled method is not promoted again
+            for i in range(20):
+                obj.func(i)
+            ok(adaptive.generation) == generation
+
+            with raises(AssertionError):
+                obj.func(None)
+            ok(Impl.__dict__['func']).is_(full_func)
+
+            set_adaptive(iface=MyInterface, promote_after=1000,
+                         max_overhead=0.0, min_calls=2)
+            full_func = Impl.__dict__['func']
+            obj.func(1)
+            obj.func(2)
+            ok(Impl.__dict__['func']).is_not(full_func)
+        finally:
+            set_adaptive(iface=MyInterface)
+
+        with raises(AssertionError):
+            obj.func(None)
+
+
+    @test("instrumented methods")
+    def test_instrumentation(self):
+        class MyInterface(Interface):
+            def func(self, x):
+                ok(x).is_a(int)
+                res = yield
+                ok(res) > 0
+
+        class Impl(ImplementsBase):
+            __implements__ = [MyInterface]
+            def func(self, x):
+                return x
+
+        obj = Impl()
+
+        def get_stats():
+            for record in stats_snapshot():
+                if record['method'] == 'func' and \
+                        record['class'].endswith('.Impl') and \
+                        record['interface'].endswith('.MyInterface'):
+                    return record
+            return None
+
+        try:
+            set_instrumentation(True, MyInterface)
+            obj.func(1)
+            obj.func(2)
+
+            with raises(AssertionError):
+                obj.func(None)
+
+            with raises(AssertionError):
+                obj.func(-1)
+
+            stats = get_stats()
+            ok(stats['calls']) == 4
+            ok(stats['pre_failures']) == 1
+            ok(stats['post_failures']) == 1
+            ok(stats['body_time']['count']) == 2
+            ok(sum(stats['body_time']['buckets'].values())) == 2
+
+            set_sampling(every=2, iface=MyInterface)
+            obj.func(1)
+            obj.func(1)
+            ok(get_stats()['unchecked_calls']) == 1
+
+            reset_stats()
+            ok(get_stats()['calls']) == 0
+        finally:
+            set_sampling(iface=MyInterface)
+            set_instrumentation(False, MyInterface)
+
+
+    @test("signature check results are cached by code and defaults")
+    def test_signature_cache(self):
+        def make_impl(default):
+            def impl(a, b=default):
+                pass
+            return impl
+
+        def intr(a, b=1):
+            pass
+
+        check_signature_acceptable(intr, make_impl(1))
+        check_signature_acceptable(intr, make_impl(1))
+        not_check_signature_acceptable(intr, make_impl(2))
+        not_check_signature_acceptable(intr, make_impl([]))
+
+
+    @test("classes from build time manifest are not checked")
+    def test_manifest(self):
+        src = "\n".join(["from interfaces import Interface, ImplementsBase",
+                         "class MyInterface(Interface):",
+                         "    def func(self, x):",
+                         "        pass",
+                         "class Impl(ImplementsBase):",
+                         "    __implements__ = [MyInterface]",
+                         "    def func(self, x):",
+                         "        return x",
+                         "{0}"])
+
+        def fail_check(*dt, **mp):
+            raise AssertionError("Should not be called")
+
+        tmp_dir = tempfile.mkdtemp()
+        module_path = os.path.join(tmp_dir, 'manifest_test_module.py')
+        old_check = interfaces.check_signature_acceptable
+        sys.path.insert(0, tmp_dir)
+        dont_write_bytecode = sys.dont_write_bytecode
+        sys.dont_write_bytecode = True
+
+        try:
+            with open(module_path, 'w') as fd:
+                fd.write(src.format(""))
+
+            import manifest_test_module as module
+            data = manifest.build([module.Impl])
+            ok(data[module.__name__]['classes']) == {
+                    'Impl' : [[[module.__name__ + '.MyInterface'],
+                               ['interfaces.ImplementsBase']]]}
+
+            manifest.current = data
+            interfaces.check_signature_acceptable = fail_check
+            reload(module)
+            ok(module.Impl().func(1)) == 1
+
+            with open(module_path, 'w') as fd:
+                fd.write(src.format("# changed"))
+            manifest.module_hashes.clear()
+
+            with raises(AssertionError):
+                reload(module)
+        finally:
+            interfaces.check_signature_acceptable = old_check
+            manifest.current = None
+            manifest.module_hashes.clear()
+            sys.dont_write_bytecode = dont_write_bytecode
+            sys.path.remove(tmp_dir)
+            sys.modules.pop('manifest_test_module', None)
+            shutil.rmtree(tmp_dir)
+
+
+    @test("lazy checked classes")
+    def test_lazy_check(self):
+        class MyInterface(Interface):
+            def func(self, x):
+                ok(x).is_a(int)
+
+        class Impl(ImplementsBase):
+            __lazy_check__ = True
+            __implements__ = [MyInterface]
+            def __init__(self, y):
+                self.y = y
+
+            def func(self, x):
+                return x + self.y
+
+        ok(Impl.__dict__['__guarded_methods__']) == {}
+        ok(Impl(1).func(1)) == 2
+        ok('func').in_(Impl.__dict__['__guarded_methods__'])
+        ok('__new__').not_in(Impl.__dict__)
+
+        with raises(AssertionError):
+            Impl(1).func(None)
+
+        class Impl2(ImplementsBase):
+            __lazy_check__ = True
+            __implements__ = [MyInterface]
+            def func(self, x):
+                return x
+
+        class Impl3(Impl2):
+            __lazy_check__ = True
+
+        with raises(AssertionError):
+            Impl3.func(Impl3(), None)
+
+        ok('__lazy_pending__').not_in(Impl2.__dict__)
+
+        class Impl4(Impl2):
+            __lazy_check__ = True
+            def func(self, x):
+                return x * 2
+
+        verify_all()
+        ok('__lazy_pending__').not_in(Impl4.__dict__)
+        ok(Impl4().func(2)) == 4
+
+        class Impl(ImplementsBase):
+            __lazy_check__ = True
+            __implements__ = [MyInterface]
+            def func(self, x, y):
+                return x
+
+        with raises(AssertionError):
+            Impl()
+
+        try:
+            with raises(AssertionError):
+                verify_all()
+        finally:
+            interfaces.pending_classes.discard(Impl)
+
+    @test("lazy classes are verified once from many threads")
+    def test_lazy_check_threads(self):
+        class MyInterface(Interface):
+            def func(self, x):
+                ok(x).is_a(int)
+
+        errors = []
+        start = threading.Event()
+
+        def worker(impl_cls):
+            start.wait()
+            try:
+                ok(impl_cls().func(1)) == 1
+            except Exception as exc:
+                errors.append(exc)
+
+        check_interval = sys.getcheckinterval()
+        sys.setcheckinterval(1)
+        try:
+            for _ in range(20):
+                class Impl(ImplementsBase):
+                    __lazy_check__ = True
+                    __implements__ = [MyInterface]
+                    def func(self, x):
+                        return x
+
+                start.clear()
+                threads = [threading.Thread(target=worker, args=(Impl,))
+                                for _ in range(8)]
+                for th in threads:
+                    th.start()
+                start.set()
+                for th in threads:
+                    th.join()
+        finally:
+            sys.setcheckinterval(check_interval)
+
+        ok(errors) == []
+
+
+    @test("subclasses guard only changed methods")
+    def test_incremental_guards(self):
+        class MyInterface(Interface):
+            def func(self, x):
+                ok(x).is_a(int)
+
+        class MyInterface2(Interface):
+            def func2(self, x):
+                ok(x).is_a(int)
+
+        class Impl(ImplementsBase):
+            __implements__ = [MyInterface]
+            def func(self, x):
+                return x
+
+            def func2(self, x):
+                return x
+
+        class Impl2(Impl):
+            pass
+
+        class Impl3(Impl2):
+            __implements__ = [MyInterface2]
+
+        class Impl4(Impl3):
+            def func(self, x):
+                return x * 2
+
+        ok(Impl2.__dict__['__guarded_methods__']) == {}
+        ok(Impl2.__interface_table__).is_(Impl.__interface_table__)
+        ok(sorted(Impl3.__dict__['__guarded_methods__'])) == ['func2']
+        ok(Impl3.__all_interfaces__) == [MyInterface2, MyInterface]
+        ok(sorted(Impl4.__dict__['__guarded_methods__'])) == ['func']
+
+        ok(Impl4().func(2)) == 4
+        ok(Impl4().func2(2)) == 2
+
+        with raises(AssertionError):
+            Impl4().func(None)
+
+        with raises(AssertionError):
+            Impl3().func2(None)
+
+        with raises(AssertionError):
+            class Impl5(Impl3):
+                def func(self, x, y):
+                    return x
+
+
+    @test("interfaces consistency results are cached")
+    def test_consistency_cache(self):
+        class MyInterface1(Interface):
+            def func(self, x, y=1):
+                pass
+
+        class MyInterface2(Interface):
+            def func(self, x, y=1):
+                pass
+
+        class MyInterface3(Interface):
+            def func(self, x):
+                pass
+
+        ImplementsMeta = type(ImplementsBase)
+        ImplementsMeta.check_interfaces_consistency([MyInterface1,
+                                                     MyInterface2])
+        key = (MyInterface1, MyInterface2)
+        ok(key).in_(interfaces.consistent_sets)
+
+        # check is order dependent - MyInterface1.func can be used
+        # instead of MyInterface3.func, but not vice versa
+        ImplementsMeta.check_interfaces_consistency([MyInterface3,
+                                                     MyInterface1])
+        try:
+            ImplementsMeta.check_interfaces_consistency([MyInterface1,
+                                                         MyInterface3])
+        except AssertionError as err:
+            ok(set([err.iface1, err.iface2])) == \
+                        set([MyInterface1, MyInterface3])
+        else:
+            raise AssertionError("Inconsistent interfaces passed check")
+
+        ok((MyInterface1, MyInterface3)).not_in(interfaces.consistent_sets)
+
+        class MyInterface1(Interface):
+            def func(self, x, y=1):
+                pass
+
+        ok(key).not_in(interfaces.consistent_sets)
+
+    @test("interfaces consistency doesn't depend on inheritance path")
+    def test_consistency_order(self):
+        class A(Interface):
+            def func(self, x):
+                pass
+
+        class B(Interface):
+            def func(self, x, y=1):
+                pass
+
+        class Base(ImplementsBase):
+            __implements__ = [A]
+            def func(self, x, y=1):
+                return x
+
+        class Base2(ImplementsBase):
+            __implements__ = [B]
+            def func(self, x, y=1):
+                return x
+
+        # [B, A] is inconsistent, [A, B] is consistent
+        with raises(AssertionError):
+            class Sub(Base):
+                __implements__ = [B]
+
+        with raises(AssertionError):
+            class Impl(ImplementsBase):
+                __implements__ = [B, A]
+                def func(self, x, y=1):
+                    return x
+
+        class Sub2(Base2):
+            __implements__ = [A]
+
+        ok(Sub2.__all_interfaces__) == [A, B]
+        ok(Sub2().func(1)) == 1
+
+
+    @test("pre and post hooks")
+    def test_hooks(self):
+        calls = []
+
+        def check_x(x, y):
+            calls.append(('pre', x))
+            ok(x).is_a(int)
+
+        def check_res(self, res, x, y):
+            calls.append(('post', res))
+            ok(res) == x + y
+
+        class MyInterface(Interface):
+            @pre(check_x)
+            @post(check_res)
+            def func(self, x, y):
+                "not called"
+
+            @contract(pre=lambda x: ok(x).is_a(int),
+                      post=lambda res, x: ok(res) > 0)
+            def func2(x):
+                pass
+
+        class Impl(ImplementsBase):
+            __implements__ = [MyInterface]
+            def func(self, x, y):
+                return x + y
+
+            def func2(self, x):
+                return x
+
+        obj = Impl()
+        ok(obj.func(1, 2)) == 3
+        ok(calls) == [('pre', 1), ('post', 3)]
+
+        # checks in body would be silently dropped
+        with raises(AssertionError):
+            @pre(check_x)
+            def func3(self, x, y):
+                ok(y) > 0
+
+        with raises(AssertionError):
+            obj.func(None, 2)
+
+        ok(obj.func2(1)) == 1
+
+        with raises(AssertionError):
+            obj.func2(-1)
+
+    @test("generator checks are split on hooks")
+    def test_split_generator(self):
+        class MyInterface(Interface):
+            def func(self, x, y=1):
+                ok(x).is_a(int)
+                res = yield
+                ok(res) == x + y
+
+            def func2(self, x):
+                z = x + 1
+                res = yield
+                ok(res) == z
+
+            def func3(self, x):
+                x = x + 1
+                res = yield
+                ok(res) == x
+
+            def func4(self, x):
+                x = yield
+                ok(x) > 0
+
+            def func5(self, x):
+                import math
+                res = yield
+                ok(res) == math.floor(x)
+
+        class Impl(ImplementsBase):
+            __implements__ = [MyInterface]
+            def func(self, x, y=1):
+                return x + y
+
+            def func2(self, x):
+                return x
+
+            def func3(self, x):
+                return x + 1
+
+            def func4(self, x):
+                return x
+
+            def func5(self, x):
+                return float(int(x))
+
+        obj = Impl()
+        ok(obj.func(1)) == 2
+
+        with raises(AssertionError):
+            obj.func(None)
+
+        ok(MyInterface.__interface_methods__['func'].__hooks__).is_not(None)
+        ok(MyInterface.__interface_methods__['func2'].__hooks__).is_(None)
+
+        with raises(AssertionError):
+            obj.func2(1)
+
+        # argument is rebound before yield
+        ok(MyInterface.__interface_methods__['func3'].__hooks__).is_(None)
+        ok(obj.func3(1)) == 2
+
+        # result has the same name, as argument
+        ok(MyInterface.__interface_methods__['func4'].__hooks__).is_(None)
+        ok(obj.func4(1)) == 1
+        with raises(AssertionError):
+            obj.func4(-1)
+
+        # name is bound by import before yield
+        ok(MyInterface.__interface_methods__['func5'].__hooks__).is_(None)
+        ok(obj.func5(1.5)) == 1.0
+
+    @test("type guards")
+    def test_check_types(self):
+        class MyInterface(Interface):
+            @check_types(x=int, y=(str, type(None)), returns=int)
+            def func(self, x, y=None):
+                pass
+
+            @check_types(x=int)
+            def func2(x):
+                ok(x) > 0
+
+        with raises(AssertionError):
+            class MyInterface2(Interface):
+                @check_types(z=int)
+                def func(self, x):
+                    pass
+
+        class Impl(ImplementsBase):
+            __implements__ = [MyInterface]
+            def func(self, x, y=None):
+                return x if y is None else None
+
+            def func2(self, x):
+                return x
+
+        obj = Impl()
+        ok(obj.func(1)) == 1
+
+        with raises(AssertionError):
+            obj.func("1")
+
+        with raises(AssertionError):
+            obj.func(1, 2)
+
+        with raises(AssertionError):
+            obj.func(1, "y")
+
+        ok(obj.func2(1)) == 1
+
+        with raises(AssertionError):
+            obj.func2(1.0)
+
+        with raises(AssertionError):
+            obj.func2(-1)
+
+
+    @test("cached pure checks")
+    def test_cache_check(self):
+        calls = []
+
+        class MyInterface(Interface):
+            @cache_check(size=4)
+            def func(self, x, *dt):
+                calls.append(x)
+                ok(x) != 0
+
+        class Impl(ImplementsBase):
+            __implements__ = [MyInterface]
+            def func(self, x, *dt):
+                return x
+
+        obj = Impl()
+        cache = MyInterface.__interface_methods__['func'].__check_cache__
+
+        obj.func(1)
+        obj.func(1)
+        obj.func(2, 3)
+        obj.func(2, 3)
+        obj.func([1])
+        obj.func([1])
+        ok(calls) == [1, 2, [1], [1]]
+        ok(cache.snapshot()['hits']) == 2
+        ok(cache.snapshot()['unhashable']) == 2
+        ok(check_cache_snapshot()[__name__ + '.MyInterface.func']) == \
+                                                        cache.snapshot()
+
+        with raises(AssertionError):
+            obj.func(0)
+
+        with raises(AssertionError):
+            obj.func(0)
+
+        for i in range(10, 20):
+            obj.func(i)
+        ok(cache.snapshot()['size']) <= 4
+
+        cache.ttl = 0
+        del calls[:]
+        obj.func(19)
+        ok(calls) == [19]
+
+        # equal values of different types are checked separately
+        types = []
+
+        class TypedInterface(Interface):
+            @cache_check()
+            def func(self, x, *dt, **mp):
+                types.append(type(x))
+                for val in (x,) + dt + tuple(mp.values()):
+                    ok(type(val)) == int
+
+        class TypedImpl(ImplementsBase):
+            __implements__ = [TypedInterface]
+            def func(self, x, *dt, **mp):
+                return x
+
+        obj = TypedImpl()
+        obj.func(1, 1, y=1)
+        for args, kwargs in (((1.0, 1), {'y' : 1}),
+                             ((True, 1), {'y' : 1}),
+                             ((1, 1.0), {'y' : 1}),
+                             ((1, 1), {'y' : True})):
+            with raises(AssertionError):
+                obj.func(*args, **kwargs)
+        ok(types) == [int, float, bool, int, int]
+
+    @test("postconditions in other thread")
+    def test_async_post(self):
+        class MyInterface(Interface):
+            def func(self, x):
+                ok(x) >= 0
+                res = yield
+                ok(res) == x
+
+            @post(lambda res, x: ok(res) == x)
+            def func2(self, x):
+                pass
+
+        class Impl(ImplementsBase):
+            __implements__ = [MyInterface]
+            def func(self, x):
+                return x % 2
+            func2 = func
+
+        failures = []
+        checker = AsyncPostChecker(sink=lambda name, exc_info:
+                                            failures.append(name))
+        set_async_post(checker, iface=MyInterface)
+        try:
+            obj = Impl()
+            ok(obj.func(1)) == 1
+            ok(obj.func(2)) == 0
+            ok(obj.func2(1)) == 1
+            ok(obj.func2(4)) == 0
+
+            # preconditions still are checked in caller thread
+            with raises(AssertionError):
+                obj.func(-1)
+
+            checker.join()
+            ok(failures) == ['func', 'func']
+            ok(checker.snapshot()['failed']) == 2
+        finally:
+            set_async_post(None, iface=MyInterface)
+            checker.stop()
+
+        with raises(AssertionError):
+            obj.func(2)
+
+    @test("lazy items checks")
+    def test_check_items(self):
+        checked = []
+        def check(item):
+            checked.append(item)
+            ok(item) >= 0
+
+        class MyInterface(Interface):
+            @check_items(check)
+            def func(self, items):
+                pass
+
+            @check_items(check, every=2, max_items=2)
+            def func2(self, items):
+                pass
+
+        class Impl(ImplementsBase):
+            __implements__ = [MyInterface]
+            def func(self, items):
+                return items
+            func2 = func
+
+        obj = Impl()
+        res = obj.func([1, 2, -1])
+        ok(checked) == []
+        ok(next(res)) == 1
+        ok(checked) == [1]
+
+        with raises(AssertionError):
+            list(res)
+
+        del checked[:]
+        ok(list(obj.func2([0, -1, 2, -3, 4, -5, -6]))) == \
+                                        [0, -1, 2, -3, 4, -5, -6]
+        ok(checked) == [0, 2]
+
+    @test("array metadata checks")
+    def test_check_arrays(self):
+        class FakeNDArray(object):
+            # numpy array metadata
+            def __init__(self, shape, dtype, flags):
+                self.shape = shape
+                self.dtype = dtype
+                self.flags = flags
+                self.flat = range(reduce(lambda x, y: x * y, shape))
+
+        sampled = []
+
+        class MyInterface(Interface):
+            @check_arrays(data=ArraySpec(shape=(None,), dtype='B',
+                                         readonly=False),
+                          returns=ArraySpec(readonly=True))
+            def func(self, data):
+                pass
+
+            @check_arrays(arr=ArraySpec(shape=(2, None), dtype='float64',
+                                        contiguous=True, samples=3,
+                                        sample_check=sampled.append))
+            def func2(self, arr):
+                pass
+
+        class Impl(ImplementsBase):
+            __implements__ = [MyInterface]
+            def func(self, data):
+                return bytes(data)
+
+            def func2(self, arr):
+                pass
+
+        obj = Impl()
+        obj.func(bytearray(b"abc"))
+        obj.func(memoryview(bytearray(b"abc")))
+
+        with raises(AssertionError):
+            obj.func(b"abc")
+
+        with raises(AssertionError):
+            obj.func(1)
+
+        flags = {'C_CONTIGUOUS' : True, 'WRITEABLE' : True}
+        obj.func2(FakeNDArray((2, 5), 'float64', flags))
+        ok(len(sampled)) == 3
+        ok(all(0 <= item < 10 for item in sampled)) == True
+
+        with raises(AssertionError):
+            obj.func2(FakeNDArray((3, 5), 'float64', flags))
+
+        with raises(AssertionError):
+            obj.func2(FakeNDArray((2, 5), 'int32', flags))
+
+        with raises(AssertionError):
+            obj.func2(FakeNDArray((2, 5), 'float64',
+                                  {'C_CONTIGUOUS' : False,
+                                   'WRITEABLE' : True}))
+
+    @test("interface to implementations registry")
+    def test_registry(self):
+        class MyInterface1(Interface):
+            def func1(self):
+                pass
+
+        class MyInterface2(MyInterface1):
+            def func2(self):
+                pass
+
+        class MyInterface3(Interface):
+            def func3(self):
+                pass
+
+        class Impl1(ImplementsBase):
+            __implements__ = [MyInterface2]
+            def func1(self):
+                pass
+            def func2(self):
+                pass
+
+        class Impl2(Impl1):
+            __implements__ = [MyInterface3]
+            def func3(self):
+                pass
+
+        ok(provides(Impl1(), MyInterface1)) == True
+        ok(provides(Impl1(), MyInterface2)) == True
+        ok(provides(Impl1, MyInterface3)) == False
+        ok(provides(Impl2(), MyInterface3)) == True
+        ok(provides(object(), MyInterface1)) == False
+
+        ok(implementations_of(MyInterface1)) == set([Impl1, Impl2])
+        ok(implementations_of(MyInterface3)) == set([Impl2])
+
+        del Impl2
+        gc.collect()
+        ok(implementations_of(MyInterface3)) == set()
+
+    @test("adapters and dispatch")
+    def test_adapters(self):
+        class Source(Interface):
+            def get(self):
+                pass
+
+        class Derived(Source):
+            pass
+
+        class Target(Interface):
+            def value(self):
+                pass
+
+        class Impl(ImplementsBase):
+            __implements__ = [Derived]
+            def get(self):
+                return 1
+
+        class Adapter(ImplementsBase):
+            __implements__ = [Target]
+            def __init__(self, obj):
+                self.obj = obj
+            def value(self):
+                return self.obj.get()
+
+        registry = adapters.AdapterRegistry()
+        registry.register(Source, Target, Adapter)
+
+        obj = Impl()
+        ok(registry.adapt(obj, Target).value()) == 1
+        ok(registry.adapt(obj, Target)).is_a(Adapter)
+        ok(registry.adapt(Adapter(obj), Target)).is_a(Adapter)
+        ok(registry.lookup(Impl, Target)).is_(Adapter)
+
+        with raises(TypeError):
+            registry.adapt(1, Target)
+
+        @registry.register(int, Target)
+        def int_adapter(val):
+            return Adapter(Impl())
+        ok(registry.adapt(1, Target).value()) == 1
+
+        combine = adapters.Dispatcher('combine')
+
+        @combine.register(Source, object)
+        def combine_any(x, y):
+            return 'any'
+
+        @combine.register(Source, int)
+        def combine_int(x, y):
+            return 'int'
+
+        ok(combine(obj, 'a')) == 'any'
+        ok(combine(obj, 1)) == 'int'
+        ok(combine.cache.data[(Impl, int)]).is_(combine_int)
+
+        @combine.register(Derived, object)
+        def combine_derived(x, y):
+            return 'derived'
+
+        ok(combine(obj, 1)) == 'derived'
+
+        with raises(TypeError):
+            combine(1, 1)
+
+        # new implementation drops cached lookups
+        class Impl2(Impl):
+            pass
+        ok(combine.lookup(Impl2, str)).is_(combine_derived)
+        ok(list(combine.cache.data)) == [(Impl2, str)]
+
+    @test("pickling of guarded methods")
+    def test_pickle_methods(self):
+        obj = PicklableImpl()
+        for method in (obj.func, obj.func2, PicklableImpl.func):
+            method = pickle.loads(pickle.dumps(method))
+            ok(method.__name__) == 'func'
+            with raises(AssertionError):
+                if method.im_self is None:
+                    method(obj, 0)
+                else:
+                    method(0)
+
+        ok(pickle.loads(pickle.dumps(obj.func))(1)) == 1
+
+        with raises(TypeError):
+            pickle.dumps(self.test_pickle_methods)
+
+        # other methods are pickled by reducer, registered before
+        other_reduce_method = interfaces.other_reduce_method
+        interfaces.other_reduce_method = \
+                lambda method: (getattr, (method.im_self,
+                                          method.im_func.__name__))
+        try:
+            ok(pickle.loads(pickle.dumps(PlainPicklable().func))()) == 1
+        finally:
+            interfaces.other_reduce_method = other_reduce_method
+
+    @test("manifest of verified classes")
+    def test_verified_manifest(self):
+        with raises(AssertionError):
+            class RejectedImpl(ImplementsBase):
+                __implements__ = [PicklableInterface]
+                def func(self, x, y):
+                    return x
+
+        class LazyRejectedImpl(ImplementsBase):
+            __lazy_check__ = True
+            __implements__ = [PicklableInterface]
+            def func(self, x, y):
+                return x
+
+        with raises(AssertionError):
+            interfaces.verify_class(LazyRejectedImpl)
+
+        class OtherInterface(Interface):
+            def func(self, x, y):
+                pass
+
+        def make(iface):
+            class FactoryImpl(ImplementsBase):
+                __implements__ = [iface]
+                def func(self, x):
+                    return x
+            return FactoryImpl
+
+        factory_impl = make(PicklableInterface)
+
+        data = manifest.verified_manifest()
+        ok(data[__name__]['classes']).contains('PicklableImpl')
+        ok('RejectedImpl').not_in(data[__name__]['classes'])
+        ok('LazyRejectedImpl').not_in(data[__name__]['classes'])
+
+        # class with the same name, but other interfaces, is not trusted
+        try:
+            manifest.use(data)
+            with raises(AssertionError):
+                make(OtherInterface)
+        finally:
+            manifest.current = None
+
+        is_trusted = lambda: interfaces.ImplementsMeta.is_trusted(
+                                        __name__, 'PicklableImpl',
+                                        PicklableImpl.__bases__,
+                                        PicklableImpl.__all_interfaces__)
+        ok(is_trusted()) == False
+        try:
+            manifest.use(data)
+            ok(is_trusted()) == True
+        finally:
+            manifest.current = None
+
+    @test("histogram of time intervals")
+    def test_histogram(self):
+        hist = method_stats.Histogram()
+        for val in (0.0, 0.0, 0.75, 3e-6):
+            hist.add(val)
+
+        ok(hist.snapshot()['buckets']) == {0.0 : 2, 1.0 : 1, 2.0 ** -18 : 1}
+        ok(hist.snapshot()['min']) == 0.0
+
+    @test("statistic and sampling from many threads")
+    def test_threads(self):
+        class MyInterface(Interface):
+            def func(self, x):
+                ok(x) > 0
+
+        class Impl(ImplementsBase):
+            __implements__ = [MyInterface]
+            def func(self, x):
+                return x
+
+        obj = Impl()
+
+        def worker():
+            for _ in range(1000):
+                obj.func(1)
+
+        check_interval = sys.getcheckinterval()
+        try:
+            set_instrumentation(True, MyInterface)
+            set_sampling(every=2, iface=MyInterface)
+            sys.setcheckinterval(1)
+
+            threads = [threading.Thread(target=worker) for _ in range(8)]
+            for th in threads:
+                th.start()
+            for th in threads:
+                th.join()
+
+            stats = Impl.__guarded_methods__['func'].stats.snapshot()
+
+            # no lost updates and every second call of each thread checked
+            ok(stats['calls']) == 4000
+            ok(stats['unchecked_calls']) == 4000
+            ok(stats['body_time']['count']) == 4000
+        finally:
+            sys.setcheckinterval(check_interval)
+            set_sampling(iface=MyInterface)
+            set_instrumentation(False, MyInterface)
+
+    @test("shards of finished threads are retired")
+    def test_retired_shards(self):
+        counters = per_thread.counters('calls')
+
+        def worker():
+            counters.get().calls += 1
+
+        for _ in range(100):
+            th = threading.Thread(target=worker)
+            th.start()
+            th.join()
+        counters.get().calls += 1
+
+        # thread local storage is released a bit later, than join returns
+        for _ in range(100):
+            if len(counters.shards) <= 2:
+                break
+            time.sleep(0.01)
+
+        ok(len(counters.shards)) <= 2
+        ok(per_thread.total(counters, 'calls')) == 101
+
+    @test("static verification")
+    def test_static_verify(self):
+        base_src = "\n".join([
+                        "from interfaces import Interface",
+                        "class BaseInterface(Interface):",
+                        "    pass"])
+        ifaces_src = "\n".join([
+                        "from interfaces import Interface",
+                        "from .base import BaseInterface",
+                        "class MyInterface(BaseInterface):",
+                        "    version = 1",
+                        "    def func(self, x, y=1):",
+                        "        pass",
+                        "class MyInterface2(Interface):",
+                        "    def func(self, x):",
+                        "        pass",
+                        "def helper(self, x):",
+                        "    pass",
+                        "class AliasInterface(Interface):",
+                        "    func = helper"])
+        impls_src = "\n".join([
+                        "from interfaces import ImplementsBase",
+                        "from .ifaces import MyInterface",
+                        "class Impl(ImplementsBase):",
+                        "    __implements__ = [MyInterface]",
+                        "    def func(self, x, y=1):",
+                        "        return x",
+                        "class SubImpl(Impl):",
+                        "    func = lambda self, x, y=1, z=2: x"])
+        bad_src = "\n".join([
+                        "from interfaces import ImplementsBase",
+                        "from . import ifaces",
+                        "class BadSignature(ImplementsBase):",
+                        "    __implements__ = [ifaces.MyInterface]",
+                        "    def func(self, x):",
+                        "        pass",
+                        "class Missing(ImplementsBase):",
+                        "    __implements__ = [ifaces.MyInterface]",
+                        "class Inconsistent(ImplementsBase):",
+                        "    __implements__ = [ifaces.MyInterface,",
+                        "                      ifaces.MyInterface2]",
+                        "    def func(self, x, y=1):",
+                        "        pass",
+                        "class Decorated(ImplementsBase):",
+                        "    __implements__ = [ifaces.MyInterface]",
+                        "    @staticmethod",
+                        "    def func(x, y=1):",
+                        "        pass",
+                        "class Base2(ImplementsBase):",
+                        "    __implements__ = [ifaces.MyInterface2]",
+                        "    def func(self, x, y=1):",
+                        "        pass",
+                        "class SubInconsistent(Base2):",
+                        "    __implements__ = [ifaces.MyInterface]",
+                        "class AliasImpl(ImplementsBase):",
+                        "    __implements__ = [ifaces.AliasInterface]",
+                        "    def func(self, x):",
+                        "        pass",
+                        "class NotLiteral(ImplementsBase):",
+                        "    __implements__ = [ifaces.MyInterface]",
+                        "    def func(self, x, y=len('a')):",
+                        "        pass"])
+
+        def fail_check(*dt, **mp):
+            raise AssertionError("Should not be called")
+
+        tmp_dir = tempfile.mkdtemp()
+        pkg_dir = os.path.join(tmp_dir, 'static_test_pkg')
+        cache_file = os.path.join(tmp_dir, 'cache.json')
+        old_check = interfaces.check_signature_acceptable
+        sys.path.insert(0, tmp_dir)
+        dont_write_bytecode = sys.dont_write_bytecode
+        sys.dont_write_bytecode = True
+
+        try:
+            os.mkdir(pkg_dir)
+            for fname, src in (('__init__.py', ''),
+                               ('base.py', base_src),
+                               ('ifaces.py', ifaces_src),
+                               ('impls.py', impls_src),
+                               ('bad.py', bad_src)):
+                with open(os.path.join(pkg_dir, fname), 'w') as fd:
+                    fd.write(src)
+
+            verifier, records, parse_errors, module_hashes, parsed = \
+                    static_verify.verify_paths([pkg_dir], cache_file, jobs=1)
+            ok(parsed) == 5
+            ok(parse_errors) == []
+
+            results = dict((record['class'].split('.')[-1], record)
+                                for record in records)
+            ok(sorted(results)) == ['AliasImpl', 'BadSignature', 'Base2',
+                                    'Decorated', 'Impl', 'Inconsistent',
+                                    'Missing', 'NotLiteral', 'SubImpl',
+                                    'SubInconsistent']
+            ok(results['Impl']['errors']) == []
+            ok(results['SubImpl']['errors']) == []
+            ok(len(results['BadSignature']['errors'])) == 1
+            ok(results['Missing']['errors']) == \
+                                    ["Method func is not implemented"]
+            ok(results['Inconsistent']['errors'][0]).contains('inconsistent')
+            ok(results['SubInconsistent']['errors'][0]).contains(
+                                                            'inconsistent')
+            ok(results['Decorated']['unverifiable']) != None
+            ok(results['NotLiteral']['unverifiable']) != None
+            ok(results['AliasImpl']['unverifiable']) != None
+
+            # only changed files are parsed again
+            ok(static_verify.verify_paths([pkg_dir], cache_file,
+                                          jobs=1)[-1]) == 0
+
+            # runtime trusts statically verified classes
+            data = static_verify.build_manifest(verifier, records,
+                                                module_hashes)
+            ok(sorted(data['static_test_pkg.impls']['classes'])) == \
+                                                    ['Impl', 'SubImpl']
+            ok(data['static_test_pkg.impls']['classes']['SubImpl']) == \
+                    [[['static_test_pkg.ifaces.MyInterface'],
+                      ['static_test_pkg.impls.Impl']]]
+            ok(sorted(data['static_test_pkg.bad']['classes'])) == ['Base2']
+            ok(data['static_test_pkg.impls']['depends']).contains(
+                                                    'static_test_pkg.base')
+
+            manifest.use(data)
+            interfaces.check_signature_acceptable = fail_check
+            import static_test_pkg.impls as module
+            ok(module.SubImpl().func(1)) == 1
+        finally:
+            interfaces.check_signature_acceptable = old_check
+            manifest.current = None
+            manifest.module_hashes.clear()
+            sys.dont_write_bytecode = dont_write_bytecode
+            sys.path.remove(tmp_dir)
+            for name in list(sys.modules):
+                if name.startswith('static_test_pkg'):
+                    del sys.modules[name]
+            shutil.rmtree(tmp_dir)
+
+    @test("implementations benchmark")
+    def test_impl_bench(self):
+        class MyInterface(Interface):
+            @check_types(x=int, y=int)
+            def add(self, x, y):
+                ok(x) >= 0
+
+            def join(self, items):
+                pass
+
+            def unknown(self, x):
+                pass
+
+        class Impl1(ImplementsBase):
+            __implements__ = [MyInterface]
+            def add(self, x, y):
+                return x + y
+            def join(self, items):
+                return ",".join(items)
+            def unknown(self, x):
+                pass
+
+        class Impl2(Impl1):
+            def add(self, x, y):
+                return sum([x, y])
+
+        records = impl_bench.benchmark(MyInterface,
+                                       {'join' : [((['a', 'b'],), {})] * 10},
+                                       count=100, repeat=2)
+        by_key = dict(((record['class'].split('.')[-1], record['method']),
+                                record) for record in records)
+        ok(sorted(by_key)) == [('Impl1', 'add'), ('Impl1', 'join'),
+                               ('Impl1', 'unknown'), ('Impl2', 'add'),
+                               ('Impl2', 'join'), ('Impl2', 'unknown')]
+
+        add = by_key[('Impl1', 'add')]
+        ok(add['rejected']) > 0
+        ok(add['calls']) == 2 * (100 - add['rejected'])
+        ok(add['p50']) <= add['p99']
+        ok(by_key[('Impl2', 'add')]['rejected']) == add['rejected']
+        ok(by_key[('Impl1', 'join')]['calls']) == 20
+        ok(by_key[('Impl2', 'unknown')]).contains('error')
+
+        passes = impl_bench.precondition(
+                            MyInterface.__interface_methods__['add'])
+        ok(passes(Impl1(), 1, 2)) == True
+        ok(passes(Impl1(), -1, 2)) == False
+        ok(passes(Impl1(), 1, 'a')) == False
+
+    @test("calls recording and replay")
+    def test_call_trace(self):
+        class MyInterface(Interface):
+            def func(self, x, *dt, **mp):
+                ok(x) >= 0
+
+            def func2(self, x):
+                pass
+
+        class Impl(ImplementsBase):
+            __implements__ = [MyInterface]
+            def func(self, x, *dt, **mp):
+                return x + len(dt) + len(mp)
+            def func2(self, x):
+                return x
+
+        class Impl2(Impl):
+            def func(self, x, *dt, **mp):
+                return x
+
+        tmp_dir = tempfile.mkdtemp()
+        fname = os.path.join(tmp_dir, 'trace')
+        recorder = CallRecorder(fname)
+        try:
+            set_recording(recorder, iface=MyInterface, method='func')
+            obj = Impl()
+            ok(obj.func(1)) == 1
+            ok(obj.func(1, 2, y=3)) == 3
+            obj.func2(1)
+            with raises(AssertionError):
+                obj.func(-1)
+            recorder.flush()
+
+            records = list(call_trace.read_trace(fname))
+            key = __name__ + '.MyInterface.func'
+            ok([record[:4] for record in records]) == \
+                        [(key, (1,), {}, 1), (key, (1, 2), {'y' : 3}, 3)]
+            ok(recorder.snapshot()['recorded']) == 2
+
+            report = call_trace.replay(fname, Impl())
+            ok(report[key]['calls']) == 2
+            ok(report[key]['mismatches']) == 0
+
+            report = call_trace.replay(fname, Impl2())
+            ok(report[key]['mismatches']) == 1
+
+            set_recording(None, iface=MyInterface, method='func')
+            recorder.close()
+
+            # sampling and size limit, log is appended
+            recorder = CallRecorder(fname, every=2,
+                                    max_bytes=os.path.getsize(fname) + 1)
+            set_recording(recorder, iface=MyInterface)
+            for i in range(6):
+                obj.func(i)
+            recorder.flush()
+
+            ok(len(list(call_trace.read_trace(fname)))) == 3
+            ok(recorder.snapshot()['skipped']) == 3
+            ok(recorder.snapshot()['dropped']) == 2
+        finally:
+            set_recording(None, iface=MyInterface, method='func')
+            set_recording(None, iface=MyInterface)
+            recorder.close()
+            shutil.rmtree(tmp_dir)
+
 
 if __name__ == '__main__':
     unittest.main()